@@ -3,6 +3,7 @@ import logging
 import json
 from datetime import datetime, time
 from pytz import timezone
+from tag_selector import compile_selector, tags_to_dict, SCHEDULE_SELECTOR
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
@@ -25,44 +26,31 @@ def get_client(service, region_name):
         aws_session_token=AWS_SESSION_TOKEN  # Optional if you have a session token
     )
 
-def get_instances_with_schedule_tag(ec2_client, tag_key, tag_value):
+def get_instances_with_schedule_tag(ec2_client, tag_key, tag_value, selector=None):
     """
-    Get all EC2 instances with a specific tag key and value in a specified region.
+    Get all EC2 instances matching the schedule selector (see tag_selector.py) in a specified region.
     """
-    filters = [
-        {
-            'Name': f'tag:{tag_key}',
-            'Values': [tag_value]
-        }
-    ]
+    filters, matches = compile_selector(selector or SCHEDULE_SELECTOR)
     response = ec2_client.describe_instances(Filters=filters)
     instances = []
     for reservation in response['Reservations']:
         for instance in reservation['Instances']:
-            plan_name = None
-            for tag in instance.get('Tags', []):
-                if tag['Key'] == 'Plan':
-                    plan_name = tag['Value']
-                    break
-            if plan_name:
-                instances.append((instance['InstanceId'], ec2_client.meta.region_name, plan_name))
+            tags = tags_to_dict(instance.get('Tags', []))
+            if tags.get('Plan') and matches(tags):
+                instances.append((instance['InstanceId'], ec2_client.meta.region_name, tags['Plan']))
     return instances
 
-def get_rds_instances_with_schedule_tag(rds_client, tag_key, tag_value):
+def get_rds_instances_with_schedule_tag(rds_client, tag_key, tag_value, selector=None):
     """
-    Get all RDS instances with a specific tag key and value in a specified region.
+    Get all RDS instances matching the schedule selector in a specified region.
     """
+    matches = compile_selector(selector or SCHEDULE_SELECTOR)[1]
     response = rds_client.describe_db_instances()
     instances = []
     for db_instance in response['DBInstances']:
-        tags = rds_client.list_tags_for_resource(ResourceName=db_instance['DBInstanceArn'])['TagList']
-        plan_name = None
-        for tag in tags:
-            if tag['Key'] == 'Plan':
-                plan_name = tag['Value']
-                break
-        if plan_name:
-            instances.append((db_instance['DBInstanceIdentifier'], rds_client.meta.region_name, plan_name))
+        tags = tags_to_dict(rds_client.list_tags_for_resource(ResourceName=db_instance['DBInstanceArn'])['TagList'])
+        if tags.get('Plan') and matches(tags):
+            instances.append((db_instance['DBInstanceIdentifier'], rds_client.meta.region_name, tags['Plan']))
     return instances
 
 def start_instances(ec2_client, instance_ids):
@@ -129,7 +117,7 @@ def manage_instances():
     print("EC2 Instances:", all_ec2_instances)
     print("RDS Instances:", all_rds_instances)
     if not all_ec2_instances and not all_rds_instances:
-        logger.info(f'No instances found with tag {tag_key}={tag_value}.')
+        logger.info(f'No instances found matching {SCHEDULE_SELECTOR}.')
         return
 
     # Determine the action based on the current day and time
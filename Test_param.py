@@ -1,8 +1,11 @@
+import argparse
 import boto3
 import logging
 import json
 from datetime import datetime, time
 from pytz import timezone
+from profiling import profile_run, stage
+from tag_selector import compile_selector, tags_to_dict, SCHEDULE_SELECTOR
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
@@ -25,29 +28,26 @@ def get_client(service, region_name):
         aws_session_token=AWS_SESSION_TOKEN  # Optional if you have a session token
     )
 
-def get_ec2_instances(ec2_client, tag_key, tag_value):
+def get_ec2_instances(ec2_client, tag_key, tag_value, selector=None):
     """
-    Get all EC2 instances with a specific tag key and value in a specified region.
+    Get all EC2 instances matching the schedule selector (see tag_selector.py) in a specified region.
     """
-    filters = [
-        {
-            'Name': f'tag:{tag_key}',
-            'Values': [tag_value]
-        }
-    ]
+    filters, matches = compile_selector(selector or SCHEDULE_SELECTOR)
     response = ec2_client.describe_instances(Filters=filters)
-    instances = [(instance['InstanceId'], ec2_client.meta.region_name) for reservation in response['Reservations'] for instance in reservation['Instances']]
+    instances = [(instance['InstanceId'], ec2_client.meta.region_name) for reservation in response['Reservations'] for instance in reservation['Instances']
+                 if matches(tags_to_dict(instance.get('Tags', [])))]
     return instances
 
-def get_rds_instances(rds_client, tag_key, tag_value):
+def get_rds_instances(rds_client, tag_key, tag_value, selector=None):
     """
-    Get all RDS instances with a specific tag key and value in a specified region.
+    Get all RDS instances matching the schedule selector in a specified region.
     """
+    matches = compile_selector(selector or SCHEDULE_SELECTOR)[1]
     response = rds_client.describe_db_instances()
     instances = []
     for db_instance in response['DBInstances']:
-        tags = rds_client.list_tags_for_resource(ResourceName=db_instance['DBInstanceArn'])['TagList']
-        if any(tag['Key'] == tag_key and tag['Value'] == tag_value for tag in tags):
+        tags = tags_to_dict(rds_client.list_tags_for_resource(ResourceName=db_instance['DBInstanceArn'])['TagList'])
+        if matches(tags):
             instances.append((db_instance['DBInstanceIdentifier'], rds_client.meta.region_name))
     return instances
 
@@ -107,15 +107,16 @@ def manage_instances():
     for region in regions:
         ec2_client = get_client('ec2', region)
         rds_client = get_client('rds', region)
-        ec2_instances = get_ec2_instances(ec2_client, tag_key, tag_value)
-        rds_instances = get_rds_instances(rds_client, tag_key, tag_value)
+        with stage(f'discover {region}'):
+            ec2_instances = get_ec2_instances(ec2_client, tag_key, tag_value)
+            rds_instances = get_rds_instances(rds_client, tag_key, tag_value)
         all_ec2_instances.extend(ec2_instances)
         all_rds_instances.extend(rds_instances)
 
     print("EC2 Instances:", all_ec2_instances)
     print("RDS Instances:", all_rds_instances)
     if not all_ec2_instances and not all_rds_instances:
-        logger.info(f'No instances found with tag {tag_key}={tag_value}.')
+        logger.info(f'No instances found matching {SCHEDULE_SELECTOR}.')
         return
 
     # Determine the action based on the current day and time
@@ -155,4 +156,11 @@ def manage_instances():
     logger.info(f'Successfully performed {action} action on RDS instances: {all_rds_instances}')
 
 if __name__ == "__main__":
-    manage_instances()
+    parser = argparse.ArgumentParser(description="Manage AWS EC2 and RDS instances based on schedule.")
+    parser.add_argument("--profile", action="store_true", help="Profile the run and write a .prof file and stage summary")
+
+    args = parser.parse_args()
+    if args.profile:
+        profile_run(manage_instances)
+    else:
+        manage_instances()
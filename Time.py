@@ -5,8 +5,9 @@ from pytz import timezone
 from common import load_schedule, get_client
 from ec2_management import get_instances_with_schedule_tag, manage_ec2_instances
 from rds_management import get_rds_clusters_with_schedule_tag, get_rds_instances_with_schedule_tag, manage_rds_clusters, manage_rds_instances
+from scheduler_logging import setup_logging, log_resources
 
-logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+setup_logging()
 logger = logging.getLogger()
 
 def should_perform_action(plan_name, current_time, schedule_data):
@@ -37,31 +38,31 @@ def manage_instances(scan_ec2, scan_rds):
     for region in regions:
         if scan_ec2:
             ec2_client = get_client('ec2', region)
-            logger.info(f"Checking EC2 instances in region: {region}")
+            logger.info('Checking EC2 instances in region: %s', region)
             ec2_instances = get_instances_with_schedule_tag(ec2_client, tag_key, tag_value)
-            logger.info(f"EC2 instances in {region}: {ec2_instances}")
+            log_resources(logger, f"EC2 instances in {region}", ec2_instances)
             all_ec2_instances.extend(ec2_instances)
 
         if scan_rds:
             rds_client = get_client('rds', region)
-            logger.info(f"Checking RDS clusters in region: {region}")
+            logger.info('Checking RDS clusters in region: %s', region)
             rds_clusters = get_rds_clusters_with_schedule_tag(rds_client, tag_key, tag_value)
-            logger.info(f"RDS clusters in {region}: {rds_clusters}")
+            log_resources(logger, f"RDS clusters in {region}", rds_clusters)
             all_rds_clusters.extend(rds_clusters)
 
-            logger.info(f"Checking RDS instances in region: {region}")
+            logger.info('Checking RDS instances in region: %s', region)
             rds_instances = get_rds_instances_with_schedule_tag(rds_client, tag_key, tag_value)
-            logger.info(f"RDS instances in {region}: {rds_instances}")
+            log_resources(logger, f"RDS instances in {region}", rds_instances)
             all_rds_instances.extend(rds_instances)
 
     if scan_ec2:
-        logger.info(f"All EC2 instances: {all_ec2_instances}")
+        log_resources(logger, 'All EC2 instances', all_ec2_instances)
     if scan_rds:
-        logger.info(f"All RDS clusters: {all_rds_clusters}")
-        logger.info(f"All RDS instances: {all_rds_instances}")
+        log_resources(logger, 'All RDS clusters', all_rds_clusters)
+        log_resources(logger, 'All RDS instances', all_rds_instances)
 
     if not all_ec2_instances and not all_rds_clusters and not all_rds_instances:
-        logger.info(f'No instances or clusters found with tag {tag_key}.')
+        logger.info('No instances or clusters found with tag %s.', tag_key)
         return
 
     now = datetime.now(timezone('UTC'))
@@ -0,0 +1,227 @@
+import argparse
+import csv
+import glob
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+import numpy as np
+from pytz import utc
+from state_tags import RUNNING_STATES
+
+logger = logging.getLogger()
+
+# One directory per UTC month, each holding compressed column files (.npz) of history rows
+HISTORY_DIR = os.getenv('ACTION_HISTORY_DIR', 'action_history')
+# ACTION_HISTORY=0 turns recording off
+HISTORY_ENABLED = os.getenv('ACTION_HISTORY', '1') != '0'
+# Runs write small segments; past this many in a month they are merged into one partition
+COMPACT_SEGMENTS = int(os.getenv('ACTION_HISTORY_COMPACT_SEGMENTS', '50'))
+
+# Event codes: a state seen during discovery, or a confirmed scheduler action
+OBSERVED = 0
+STARTED = 1
+STOPPED = 2
+
+# String columns are dictionary-encoded per file: int32 codes plus a sorted table of values
+STRING_COLUMNS = ('kind', 'resource_id', 'region', 'account', 'plan')
+GROUP_COLUMNS = ('plan', 'account', 'region')
+
+def run_rows(observed, confirmed, account, observed_at, confirmed_at):
+    """
+    Build history rows (ts, event, running, kind, resource_id, region, account, plan) for one run from
+    the discovered (kind, resource tuple) pairs and the confirmed (window, kind, resource_id, region, action) entries.
+    """
+    rows = []
+    plans = {}
+    observed_ts = int(observed_at.timestamp())
+    for kind, (resource_id, region, plan_name, state, details) in observed:
+        plans[(kind, resource_id)] = plan_name
+        rows.append((observed_ts, OBSERVED, state in RUNNING_STATES, kind, resource_id, region, account, plan_name))
+    confirmed_ts = int(confirmed_at.timestamp())
+    for window, kind, resource_id, region, action in confirmed:
+        started = action == 'start'
+        rows.append((confirmed_ts, STARTED if started else STOPPED, started, kind, resource_id, region, account, plans.get((kind, resource_id), '')))
+    return rows
+
+def encode(values):
+    """
+    Dictionary-encode a sequence of strings into (int32 codes, sorted value table).
+    """
+    table, codes = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+    return codes.astype(np.int32), table
+
+def save_columns(path, columns):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as file:
+        np.savez_compressed(file, **columns)
+    os.replace(tmp_path, path)
+
+def load_columns(path):
+    with np.load(path, allow_pickle=False) as data:
+        return {name: data[name] for name in data.files}
+
+def month_partitions(directory, month):
+    return sorted(glob.glob(os.path.join(directory, month, '*.npz')))
+
+def append_history(rows, directory=HISTORY_DIR):
+    """
+    Write rows as one new segment per UTC month they fall in, compacting a month once it has
+    accumulated COMPACT_SEGMENTS segments.
+    """
+    if not rows:
+        return
+    ts = np.array([row[0] for row in rows], dtype=np.int64)
+    months = np.array([datetime.fromtimestamp(int(t), utc).strftime('%Y-%m') for t in ts])
+    for month in np.unique(months):
+        selected = [row for row, row_month in zip(rows, months) if row_month == month]
+        columns = {'ts': ts[months == month], 'event': np.array([row[1] for row in selected], dtype=np.int8),
+                   'running': np.array([row[2] for row in selected], dtype=bool)}
+        for offset, name in enumerate(STRING_COLUMNS, start=3):
+            columns[f'{name}_codes'], columns[f'{name}_values'] = encode([row[offset] for row in selected])
+        os.makedirs(os.path.join(directory, month), exist_ok=True)
+        save_columns(os.path.join(directory, month, f'segment-{time.time_ns()}-{os.getpid()}.npz'), columns)
+        segments = [path for path in month_partitions(directory, month) if os.path.basename(path).startswith('segment-')]
+        if len(segments) >= COMPACT_SEGMENTS:
+            compact_month(directory, month)
+
+def merge_columns(partitions):
+    """
+    Concatenate partitions, re-encoding every string column against one combined value table.
+    """
+    merged = {name: np.concatenate([partition[name] for partition in partitions]) for name in ('ts', 'event', 'running')}
+    for name in STRING_COLUMNS:
+        table = np.unique(np.concatenate([partition[f'{name}_values'] for partition in partitions]))
+        merged[f'{name}_codes'] = np.concatenate([
+            np.searchsorted(table, partition[f'{name}_values']).astype(np.int32)[partition[f'{name}_codes']]
+            for partition in partitions
+        ])
+        merged[f'{name}_values'] = table
+    return merged
+
+def compact_month(directory, month):
+    """
+    Merge every file of a month into a single partition.
+    """
+    paths = month_partitions(directory, month)
+    if len(paths) < 2:
+        return
+    save_columns(os.path.join(directory, month, f'part-{time.time_ns()}.npz'), merge_columns([load_columns(path) for path in paths]))
+    for path in paths:
+        os.remove(path)
+    logger.info('Compacted %d history files for %s', len(paths), month)
+
+def load_history(since, until, directory=HISTORY_DIR):
+    """
+    Load every row from the month before since through the month of until. The extra month
+    supplies each resource's state going into the range.
+    """
+    first = datetime(since.year - (since.month == 1), (since.month - 2) % 12 + 1, 1).strftime('%Y-%m')
+    last = until.strftime('%Y-%m')
+    months = sorted(name for name in os.listdir(directory) if first <= name <= last) if os.path.isdir(directory) else []
+    partitions = [load_columns(path) for month in months for path in month_partitions(directory, month)]
+    if not partitions:
+        return None
+    return merge_columns(partitions)
+
+def combine_codes(history, names):
+    """
+    Fold several code columns into one int64 key per row, so rows can be grouped with a flat sort.
+    """
+    key = np.zeros(len(history['ts']), dtype=np.int64)
+    for name in names:
+        key = key * len(history[f'{name}_values']) + history[f'{name}_codes']
+    return key
+
+def split_key(history, names, key):
+    """
+    Recover the per-column codes from a key built by combine_codes.
+    """
+    codes = []
+    for name in reversed(names):
+        key, code = divmod(int(key), len(history[f'{name}_values']))
+        codes.append(code)
+    return list(reversed(codes))
+
+def aggregate(history, since_ts, until_ts, by=GROUP_COLUMNS):
+    """
+    Sum running hours and avoided hours per group between two epoch seconds. Each row holds its
+    state until the resource's next row, or the last recorded run for its last row; time stopped counts as avoided from a confirmed scheduler
+    stop until the resource is next seen running.
+    """
+    resource = combine_codes(history, ('kind', 'resource_id', 'region', 'account'))
+    order = np.lexsort((history['ts'], resource))
+    resource = resource[order]
+    ts = history['ts'][order]
+    running = history['running'][order]
+    event = history['event'][order]
+
+    # Nothing is known past the last recorded run, so a resource's last row is held only until then
+    end_ts = min(until_ts, int(ts.max()))
+    last_of_resource = np.append(resource[1:] != resource[:-1], True)
+    next_ts = np.where(last_of_resource, end_ts, np.append(ts[1:], end_ts))
+    duration = np.clip(next_ts, since_ts, until_ts) - np.clip(ts, since_ts, until_ts)
+
+    # Carry the "stopped by the scheduler" flag forward over observations that saw the resource stopped
+    first_of_resource = np.insert(resource[1:] != resource[:-1], 0, True)
+    flag = np.where(event == STOPPED, 1, np.where(running, 0, -1))
+    flag = np.where(first_of_resource & (flag < 0), 0, flag)
+    last_set = np.maximum.accumulate(np.where(flag >= 0, np.arange(len(flag)), -1))
+    avoided = (flag[last_set] == 1) & ~running
+
+    groups, group = np.unique(combine_codes(history, by)[order], return_inverse=True)
+    uptime = np.bincount(group, weights=duration * running, minlength=len(groups)) / 3600
+    saved = np.bincount(group, weights=duration * avoided, minlength=len(groups)) / 3600
+    active = duration > 0
+    resources = np.bincount(np.unique(group[active].astype(np.int64) * (resource.max() + 1) + resource[active]) // (resource.max() + 1),
+                            minlength=len(groups))
+
+    results = []
+    for g, key in enumerate(groups):
+        if not resources[g]:
+            continue
+        result = {name: str(history[f'{name}_values'][code]) for name, code in zip(by, split_key(history, by, key))}
+        result.update({'resources': int(resources[g]), 'uptime_hours': round(float(uptime[g]), 2), 'avoided_hours': round(float(saved[g]), 2)})
+        results.append(result)
+    return sorted(results, key=lambda result: -result['avoided_hours'])
+
+def parse_day(value):
+    return utc.localize(datetime.fromisoformat(value))
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    parser = argparse.ArgumentParser(description="Aggregate uptime and avoided instance-hours from the action history.")
+    parser.add_argument("--since", required=True, help="Start of the range in ISO format (UTC)")
+    parser.add_argument("--until", help="End of the range in ISO format (UTC); defaults to now")
+    parser.add_argument("--by", default=",".join(GROUP_COLUMNS), help="Comma-separated grouping columns from: plan, account, region, kind")
+    parser.add_argument("--dir", default=HISTORY_DIR, help="History directory")
+    parser.add_argument("--output", help="Write the results as CSV to this file ('-' for stdout)")
+    parser.add_argument("--compact", action="store_true", help="Merge each month's segments into one partition first")
+
+    args = parser.parse_args()
+    since = parse_day(args.since)
+    until = parse_day(args.until) if args.until else datetime.now(utc)
+    by = tuple(args.by.split(','))
+
+    if args.compact and os.path.isdir(args.dir):
+        for month in sorted(os.listdir(args.dir)):
+            compact_month(args.dir, month)
+
+    started = time.perf_counter()
+    history = load_history(since, until, args.dir)
+    if history is None:
+        logger.info('No action history in %s for the requested range.', args.dir)
+        sys.exit(0)
+    results = aggregate(history, int(since.timestamp()), int(until.timestamp()), by)
+
+    if args.output:
+        with (sys.stdout if args.output == '-' else open(args.output, 'w', newline='')) as file:
+            writer = csv.DictWriter(file, fieldnames=list(by) + ['resources', 'uptime_hours', 'avoided_hours'])
+            writer.writeheader()
+            writer.writerows(results)
+    else:
+        print(''.join(f'{name:<24}' for name in by) + f"{'resources':>10}{'uptime h':>14}{'avoided h':>14}")
+        for result in results:
+            print(''.join(f'{result[name]:<24}' for name in by) + f"{result['resources']:>10}{result['uptime_hours']:>14.1f}{result['avoided_hours']:>14.1f}")
+    logger.info('Aggregated %d rows into %d groups in %.2f s', len(history['ts']), len(results), time.perf_counter() - started)
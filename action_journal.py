@@ -0,0 +1,98 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from pytz import timezone
+
+# Journal statuses, in the order an action moves through them
+PLANNED = 'planned'
+DISPATCHED = 'dispatched'
+CONFIRMED = 'confirmed'
+FAILED = 'failed'
+
+DEFAULT_JOURNAL_PATH = 'action_journal.ndjson'
+
+_write_lock = threading.Lock()
+
+def get_journal_path():
+    """
+    Return the journal file path, overridable with the ACTION_JOURNAL environment variable.
+    """
+    return os.getenv('ACTION_JOURNAL', DEFAULT_JOURNAL_PATH)
+
+def transition_window(plan_name, action, when):
+    """
+    Identify the plan transition an action belongs to, down to the minute.
+    """
+    return f"{plan_name}:{action}:{when.strftime('%Y-%m-%dT%H:%M')}"
+
+def append_entries(path, actions, status, error=None):
+    """
+    Append one journal line per (window, kind, resource_id, region, action) tuple with the given status.
+    """
+    if not actions:
+        return
+    ts = datetime.now(timezone('UTC')).isoformat()
+    with _write_lock, open(path, 'a') as journal:
+        for window, kind, resource_id, region, action in actions:
+            entry = {
+                'ts': ts,
+                'window': window,
+                'kind': kind,
+                'resource_id': resource_id,
+                'region': region,
+                'action': action,
+                'status': status,
+            }
+            if error is not None:
+                entry['error'] = str(error)
+            journal.write(json.dumps(entry) + '\n')
+        journal.flush()
+
+def read_entries(path):
+    """
+    Yield journal entries, skipping a torn last line left behind by a crash.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'r') as journal:
+        for line in journal:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+def latest_statuses(path):
+    """
+    Return the most recent status per (window, kind, resource_id).
+    """
+    statuses = {}
+    for entry in read_entries(path):
+        statuses[(entry['window'], entry['kind'], entry['resource_id'])] = entry['status']
+    return statuses
+
+def completed_keys(path):
+    """
+    Return the (window, kind, resource_id) keys whose action has been confirmed.
+    """
+    return {key for key, status in latest_statuses(path).items() if status == CONFIRMED}
+
+def outstanding_keys(path):
+    """
+    Return the (window, kind, resource_id) keys that were planned or dispatched but never confirmed.
+    """
+    return {key for key, status in latest_statuses(path).items() if status != CONFIRMED}
+
+def prune_journal(path, max_age_days=7):
+    """
+    Drop entries older than max_age_days so the journal stays small between runs.
+    """
+    if not os.path.exists(path):
+        return
+    cutoff = datetime.now(timezone('UTC')) - timedelta(days=max_age_days)
+    kept = [entry for entry in read_entries(path) if datetime.fromisoformat(entry['ts']) >= cutoff]
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as journal:
+        for entry in kept:
+            journal.write(json.dumps(entry) + '\n')
+    os.replace(tmp_path, path)
@@ -1,184 +1,696 @@
 import boto3
 import logging
 import json
-from datetime import datetime
+import os
+import time
+import functools
+from datetime import datetime, timedelta
 from pytz import timezone
+from action_journal import get_journal_path, transition_window, append_entries, completed_keys, outstanding_keys, prune_journal, PLANNED, DISPATCHED, CONFIRMED, FAILED
+from scheduler_logging import setup_logging, log_resources
+from cassette import attach_cassette
+from pipeline import run_pipeline
+from ec2_batch import call_in_batches, EC2_BATCH_SIZE
+from wave_scheduler import assign_waves, group_waves, run_waves, resource_dependencies, WAVE_TAG, DEPENDS_ON_TAG
+from transition_index import build_transition_index, transitions_since, upcoming_starts, group_by_plan
+from last_run import load_last_run, save_last_run
+from tag_selector import compile_selector, tags_to_dict, SCHEDULE_SELECTOR
+from state_tags import plan_version, build_state_tags, already_applied, write_ec2_state_tags, write_rds_state_tags
+from run_lock import hold_run_lock, run_lock_lost
+from tagging_discovery import discover_region, DISCOVERY
+from parallel_scan import scan_in_processes, SCAN_PROCESSES
+from profiling import stage, profile_run, SCHEDULER_PROFILE
+from tracing import span, attach_tracing, trace_run, SCHEDULER_TRACE
+from resilience import attach_resilience, client_config, start_run, remaining_seconds, deadline_passed, CircuitOpenError, RunDeadlineExceeded
+from boot_latency import load_store, save_store, record_starts, record_ready, expire_pending, pending_by_region, lead_seconds, max_lead_seconds, PRESTART_ENABLED, PRESTART_HORIZON_MINUTES
 
 # Set up logging
-logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+setup_logging()
 logger = logging.getLogger()
 
+# Same switch as action_history.HISTORY_ENABLED, read here so that module and NumPy load only when recording
+HISTORY_ENABLED = os.getenv('ACTION_HISTORY', '1') != '0'
+
 def load_schedule(file_path='schedule.json'):
     with open(file_path, 'r') as file:
         return json.load(file)
 
 def get_client(service, region_name):
-    return boto3.client(service, region_name=region_name)
-
-def get_instances_with_schedule_tag(ec2_client, tag_key, tag_value):
-    filters = [{'Name': f'tag:{tag_key}', 'Values': [tag_value]}]
-    response = ec2_client.describe_instances(Filters=filters)
-    instances = []
-    for reservation in response['Reservations']:
-        for instance in reservation['Instances']:
-            schedule_on = False
-            plan_name = None
-            for tag in instance.get('Tags', []):
-                if tag['Key'] == 'Schedule' and tag['Value'] == 'On':
-                    schedule_on = True
-                if tag['Key'] == 'Plan':
-                    plan_name = tag['Value']
-            if schedule_on and plan_name:
-                instances.append((instance['InstanceId'], ec2_client.meta.region_name, plan_name, instance['State']['Name']))
-    return instances
-
-def get_rds_clusters_with_schedule_tag(rds_client, tag_key, tag_value):
-    response = rds_client.describe_db_clusters()
-    clusters = []
-    for cluster in response['DBClusters']:
-        schedule_on = False
-        plan_name = None
-        tags_response = rds_client.list_tags_for_resource(ResourceName=cluster['DBClusterArn'])
-        for tag in tags_response['TagList']:
-            if tag['Key'] == 'Schedule' and tag['Value'] == 'On':
-                schedule_on = True
-            if tag['Key'] == 'Plan':
-                plan_name = tag['Value']
-        if schedule_on and plan_name:
-            clusters.append((cluster['DBClusterIdentifier'], rds_client.meta.region_name, plan_name, cluster['Status']))
-    return clusters
-
-def get_rds_instances_with_schedule_tag(rds_client, tag_key, tag_value):
-    response = rds_client.describe_db_instances()
-    instances = []
-    for instance in response['DBInstances']:
-        schedule_on = False
-        plan_name = None
-        tags_response = rds_client.list_tags_for_resource(ResourceName=instance['DBInstanceArn'])
-        for tag in tags_response['TagList']:
-            if tag['Key'] == 'Schedule' and tag['Value'] == 'On':
-                schedule_on = True
-            if tag['Key'] == 'Plan':
-                plan_name = tag['Value']
-        if schedule_on and plan_name:
-            instances.append((instance['DBInstanceIdentifier'], rds_client.meta.region_name, plan_name, instance['DBInstanceStatus']))
-    return instances
+    # SCHEDULER_ENDPOINT_URL points every client at a local stand-in such as fake_aws.py
+    endpoint_url = os.getenv('SCHEDULER_ENDPOINT_URL')
+    client = boto3.client(service, region_name=region_name, endpoint_url=endpoint_url, config=client_config())
+    return attach_tracing(attach_resilience(attach_cassette(client)))
+
+# The credentials' account never changes within a process, so STS is asked once (until it answers)
+_account_id = None
+
+def get_account_id(region):
+    """
+    Look up the account the credentials belong to; blank if STS is unreachable.
+    """
+    global _account_id
+    if _account_id is None:
+        try:
+            _account_id = get_client('sts', region).get_caller_identity()['Account']
+        except Exception as e:
+            logger.warning('Could not determine account id: %s', e)
+            return ''
+    return _account_id
+
+def iter_instances_with_schedule_tag(ec2_client, tag_key, tag_value, applied_windows=None, plans=None, selector=None):
+    # The selector replaces the fixed tag_key/tag_value match; see tag_selector.py
+    filters, matches = compile_selector(selector or SCHEDULE_SELECTOR)
+    filters = list(filters)
+    if plans:
+        filters.append({'Name': 'tag:Plan', 'Values': sorted(plans)})
+    for page in ec2_client.get_paginator('describe_instances').paginate(Filters=filters):
+        for reservation in page['Reservations']:
+            for instance in reservation['Instances']:
+                tags = tags_to_dict(instance.get('Tags', []))
+                plan_name = tags.get('Plan')
+                if plan_name and matches(tags):
+                    if applied_windows and already_applied(tags, applied_windows):
+                        continue
+                    yield (instance['InstanceId'], ec2_client.meta.region_name, plan_name, instance['State']['Name'], {'tags': tags, 'type': instance.get('InstanceType'), 'hibernation': instance.get('HibernationOptions', {}).get('Configured', False)})
+
+def iter_rds_clusters_with_schedule_tag(rds_client, tag_key, tag_value, applied_windows=None, selector=None):
+    matches = compile_selector(selector or SCHEDULE_SELECTOR)[1]
+    for page in rds_client.get_paginator('describe_db_clusters').paginate():
+        for cluster in page['DBClusters']:
+            tags_response = rds_client.list_tags_for_resource(ResourceName=cluster['DBClusterArn'])
+            tags = tags_to_dict(tags_response['TagList'])
+            plan_name = tags.get('Plan')
+            if plan_name and matches(tags):
+                if applied_windows and already_applied(tags, applied_windows):
+                    continue
+                yield (cluster['DBClusterIdentifier'], rds_client.meta.region_name, plan_name, cluster['Status'], {'tags': tags, 'arn': cluster['DBClusterArn'], 'type': cluster.get('Engine')})
+
+def iter_rds_instances_with_schedule_tag(rds_client, tag_key, tag_value, applied_windows=None, selector=None):
+    matches = compile_selector(selector or SCHEDULE_SELECTOR)[1]
+    for page in rds_client.get_paginator('describe_db_instances').paginate():
+        for instance in page['DBInstances']:
+            tags_response = rds_client.list_tags_for_resource(ResourceName=instance['DBInstanceArn'])
+            tags = tags_to_dict(tags_response['TagList'])
+            plan_name = tags.get('Plan')
+            if plan_name and matches(tags):
+                if applied_windows and already_applied(tags, applied_windows):
+                    continue
+                yield (instance['DBInstanceIdentifier'], rds_client.meta.region_name, plan_name, instance['DBInstanceStatus'], {'tags': tags, 'arn': instance['DBInstanceArn'], 'type': instance.get('DBInstanceClass')})
+
+def get_instances_with_schedule_tag(ec2_client, tag_key, tag_value, applied_windows=None, plans=None):
+    return list(iter_instances_with_schedule_tag(ec2_client, tag_key, tag_value, applied_windows, plans))
+
+def get_rds_clusters_with_schedule_tag(rds_client, tag_key, tag_value, applied_windows=None):
+    return list(iter_rds_clusters_with_schedule_tag(rds_client, tag_key, tag_value, applied_windows))
+
+def get_rds_instances_with_schedule_tag(rds_client, tag_key, tag_value, applied_windows=None):
+    return list(iter_rds_instances_with_schedule_tag(rds_client, tag_key, tag_value, applied_windows))
 
 def start_ec2_instances(ec2_client, instance_ids):
+    succeeded, failed = [], []
     if instance_ids:
-        ec2_client.start_instances(InstanceIds=instance_ids)
-        logger.info(f'Successfully started EC2 instances: {instance_ids}')
+        succeeded, failed = call_in_batches(lambda batch: ec2_client.start_instances(InstanceIds=batch), instance_ids)
+        if succeeded:
+            logger.info('Successfully started EC2 instances: %s', succeeded)
+        if failed:
+            logger.error('Error starting EC2 instances: %s', failed)
+    return succeeded, failed
+
+# Hibernation can be refused for a configured instance (e.g. not yet ready after boot); those get a plain stop
+HIBERNATE_FALLBACK_CODES = ('UnsupportedHibernationConfiguration', 'UnsupportedOperation')
 
-def stop_ec2_instances(ec2_client, instance_ids):
+def stop_ec2_instances(ec2_client, instance_ids, hibernate=False):
+    succeeded, failed = [], []
     if instance_ids:
-        ec2_client.stop_instances(InstanceIds=instance_ids)
-        logger.info(f'Successfully stopped EC2 instances: {instance_ids}')
+        succeeded, failed = call_in_batches(lambda batch: ec2_client.stop_instances(InstanceIds=batch, Hibernate=hibernate), instance_ids)
+        if succeeded:
+            logger.info('Successfully %s EC2 instances: %s', 'hibernated' if hibernate else 'stopped', succeeded)
+        fallback = [instance_id for instance_id, code in failed if hibernate and code in HIBERNATE_FALLBACK_CODES]
+        if fallback:
+            logger.warning('Hibernation refused for EC2 instances %s; stopping them instead', fallback)
+            stopped, still_failed = stop_ec2_instances(ec2_client, fallback)
+            succeeded = succeeded + stopped
+            failed = [item for item in failed if item[0] not in fallback] + still_failed
+        if failed:
+            logger.error('Error stopping EC2 instances: %s', failed)
+    return succeeded, failed
 
 def start_rds_cluster(rds_client, cluster_id):
     try:
         rds_client.start_db_cluster(DBClusterIdentifier=cluster_id)
-        logger.info(f'Successfully started RDS cluster: {cluster_id}')
+        logger.info('Successfully started RDS cluster: %s', cluster_id)
+        return True
     except Exception as e:
-        logger.error(f"Error starting RDS cluster {cluster_id}: {e}")
+        logger.error('Error starting RDS cluster %s: %s', cluster_id, e)
+        return False
 
 def stop_rds_cluster(rds_client, cluster_id):
     try:
         rds_client.stop_db_cluster(DBClusterIdentifier=cluster_id)
-        logger.info(f'Successfully stopped RDS cluster: {cluster_id}')
+        logger.info('Successfully stopped RDS cluster: %s', cluster_id)
+        return True
     except Exception as e:
-        logger.error(f"Error stopping RDS cluster {cluster_id}: {e}")
+        logger.error('Error stopping RDS cluster %s: %s', cluster_id, e)
+        return False
 
 def start_rds_instance(rds_client, instance_id):
     try:
         rds_client.start_db_instance(DBInstanceIdentifier=instance_id)
-        logger.info(f'Successfully started RDS instance: {instance_id}')
+        logger.info('Successfully started RDS instance: %s', instance_id)
+        return True
     except Exception as e:
-        logger.error(f"Error starting RDS instance {instance_id}: {e}")
+        logger.error('Error starting RDS instance %s: %s', instance_id, e)
+        return False
 
 def stop_rds_instance(rds_client, instance_id):
     try:
         rds_client.stop_db_instance(DBInstanceIdentifier=instance_id)
-        logger.info(f'Successfully stopped RDS instance: {instance_id}')
+        logger.info('Successfully stopped RDS instance: %s', instance_id)
+        return True
     except Exception as e:
-        logger.error(f"Error stopping RDS instance {instance_id}: {e}")
-
-def get_action(schedule, current_day, current_time):
-    for key, value in schedule.items():
-        if current_day in value['start_days'] and current_time == value['start_time']:
-            return 'start'
-        if current_day in value['stop_days'] and current_time == value['stop_time']:
-            return 'stop'
+        logger.error('Error stopping RDS instance %s: %s', instance_id, e)
+        return False
+
+DISPATCHERS = {
+    ('ec2', 'start'): lambda client, resource_id: not start_ec2_instances(client, [resource_id])[1],
+    ('ec2', 'stop'): lambda client, resource_id: not stop_ec2_instances(client, [resource_id])[1],
+    ('rds_cluster', 'start'): start_rds_cluster,
+    ('rds_cluster', 'stop'): stop_rds_cluster,
+    ('rds_instance', 'start'): start_rds_instance,
+    ('rds_instance', 'stop'): stop_rds_instance,
+}
+
+RUNNING_STATES = {'ec2': 'running', 'rds_cluster': 'available', 'rds_instance': 'available'}
+
+def decide_action(kind, resource, due, windows, resource_details, hibernate_plans=frozenset()):
+    resource_id, region, plan_name, state, details = resource
+    action = due.get(plan_name)
+    if (action == 'start' and state == 'stopped') or (action == 'stop' and state == RUNNING_STATES[kind]):
+        # Plans opt in with "hibernate": true; only instances launched with hibernation configured qualify
+        details['hibernate'] = action == 'stop' and plan_name in hibernate_plans and bool(details.get('hibernation'))
+        resource_details[(kind, resource_id)] = details
+        return (windows[plan_name], kind, resource_id, region, action)
+    return None
+
+def settled_entry(kind, resource, due, windows, outstanding):
+    # An action an earlier run left unconfirmed whose resource is now in the target state took effect after all
+    resource_id, region, plan_name, state, details = resource
+    action = due.get(plan_name)
+    if action and (windows[plan_name], kind, resource_id) in outstanding and state == (RUNNING_STATES[kind] if action == 'start' else 'stopped'):
+        return (windows[plan_name], kind, resource_id, region, action)
+    return None
+
+def decide_prestart(kind, resource, minutes_until, windows, resource_details, boot_store):
+    # Start early when the learned time-to-ready no longer fits before the scheduled minute
+    resource_id, region, plan_name, state, details = resource
+    if state == 'stopped' and minutes_until * 60 <= lead_seconds(boot_store, kind, resource_id, details.get('type')):
+        resource_details[(kind, resource_id)] = details
+        return (windows[plan_name], kind, resource_id, region, 'start')
+    return None
+
+def observe_boot_latency(boot_store):
+    # Time-to-ready is learned by polling resources started on earlier runs until they report ready
+    for (kind, region), resource_ids in pending_by_region(boot_store).items():
+        try:
+            if kind == 'ec2':
+                pages = get_client('ec2', region).get_paginator('describe_instances').paginate(Filters=[{'Name': 'instance-id', 'Values': resource_ids}])
+                ready = [instance['InstanceId'] for page in pages for reservation in page['Reservations'] for instance in reservation['Instances'] if instance['State']['Name'] == 'running']
+            else:
+                rds_client = get_client('rds', region)
+                ready = []
+                for resource_id in resource_ids:
+                    if kind == 'rds_cluster':
+                        status = rds_client.describe_db_clusters(DBClusterIdentifier=resource_id)['DBClusters'][0]['Status']
+                    else:
+                        status = rds_client.describe_db_instances(DBInstanceIdentifier=resource_id)['DBInstances'][0]['DBInstanceStatus']
+                    if status == 'available':
+                        ready.append(resource_id)
+        except Exception as e:
+            logger.error('Error checking readiness of %s %s in %s: %s', kind, resource_ids, region, e)
+            continue
+        for resource_id in ready:
+            seconds = record_ready(boot_store, kind, resource_id)
+            logger.info('%s %s became ready %.0f seconds after start', kind, resource_id, seconds)
+    expire_pending(boot_store)
+
+def remember_starts(boot_store, confirmed, resource_details):
+    record_starts(boot_store, [(kind, resource_id, region, resource_details[(kind, resource_id)].get('type'))
+                               for window, kind, resource_id, region, action in confirmed if action == 'start'])
+
+def record_history(observed, confirmed, region, observed_at):
+    """
+    Append this run's observed states and confirmed actions to the columnar action history.
+    """
+    if not HISTORY_ENABLED or not (observed or confirmed):
+        return
+    try:
+        from action_history import run_rows, append_history
+        append_history(run_rows(observed, confirmed, get_account_id(region), observed_at, datetime.now(observed_at.tzinfo)))
+    except Exception as e:
+        logger.error('Error writing action history: %s', e)
+
+def dispatch_action(journal_path, entry):
+    window, kind, resource_id, region, action = entry
+    client = get_client('ec2' if kind == 'ec2' else 'rds', region)
+    append_entries(journal_path, [entry], DISPATCHED)
+    try:
+        with span(f'{action} {kind}', 'dispatch', region=region, resource=resource_id):
+            result = DISPATCHERS[(kind, action)](client, resource_id)
+    except Exception as e:
+        logger.error('Error performing %s on %s %s: %s', action, kind, resource_id, e)
+        append_entries(journal_path, [entry], FAILED, error=e)
+        return False
+    append_entries(journal_path, [entry], FAILED if result is False else CONFIRMED)
+    return result is not False
+
+def dispatch_batch(journal_path, batch, resource_details=None):
+    window, kind, resource_id, region, action = batch[0]
+    if kind != 'ec2':
+        return [entry for entry in batch if dispatch_action(journal_path, entry)]
+    # EC2 entries in a batch share region, action and hibernate choice; one call covers them all
+    by_id = {entry[2]: entry for entry in batch}
+    append_entries(journal_path, batch, DISPATCHED)
+    try:
+        with span(f'{action} ec2 batch', 'dispatch', region=region, count=len(batch)):
+            if action == 'start':
+                succeeded, failed = start_ec2_instances(get_client('ec2', region), list(by_id))
+            else:
+                hibernate = (resource_details or {}).get((kind, resource_id), {}).get('hibernate', False)
+                succeeded, failed = stop_ec2_instances(get_client('ec2', region), list(by_id), hibernate)
+    except Exception as e:
+        logger.error('Error performing %s on EC2 instances %s: %s', action, list(by_id), e)
+        append_entries(journal_path, batch, FAILED, error=e)
+        return []
+    for instance_id, code in failed:
+        append_entries(journal_path, [by_id[instance_id]], FAILED, error=code)
+    confirmed = [by_id[instance_id] for instance_id in succeeded]
+    append_entries(journal_path, confirmed, CONFIRMED)
+    return confirmed
+
+def make_batches(entries, resource_details=None):
+    batches = {}
+    for entry in entries:
+        kind = entry[1]
+        hibernate = (resource_details or {}).get((kind, entry[2]), {}).get('hibernate', False)
+        key = (kind, entry[3], entry[4], hibernate) if kind == 'ec2' else (kind, entry[2])
+        batches.setdefault(key, []).append(entry)
+    return [batch[i:i + EC2_BATCH_SIZE] for batch in batches.values() for i in range(0, len(batch), EC2_BATCH_SIZE)]
+
+def write_back_state(confirmed, resource_details, versions):
+    groups = {}
+    for window, kind, resource_id, region, action in confirmed:
+        groups.setdefault((kind, region, window, action), []).append(resource_id)
+    for (kind, region, window, action), resource_ids in groups.items():
+        tags = build_state_tags(action, window, versions[window])
+        if kind == 'ec2':
+            write_ec2_state_tags(get_client('ec2', region), resource_ids, tags)
+        else:
+            write_rds_state_tags(get_client('rds', region), [resource_details[(kind, resource_id)]['arn'] for resource_id in resource_ids], tags)
+
+WAVE_READY_TIMEOUT = int(os.getenv('WAVE_READY_TIMEOUT', '1800'))
+WAVE_POLL_SECONDS = 15
+
+def wait_budget():
+    # Waiting never outlasts the run: the next wave could not be dispatched after the deadline anyway
+    remaining = remaining_seconds()
+    return WAVE_READY_TIMEOUT if remaining is None else min(WAVE_READY_TIMEOUT, remaining)
+
+def wait_until_ready(entries):
+    groups = {}
+    for window, kind, resource_id, region, action in entries:
+        groups.setdefault((kind, region, action), []).append(resource_id)
+    for (kind, region, action), resource_ids in groups.items():
+        budget = wait_budget()
+        if budget <= 0:
+            logger.error('No time left to wait for %s %s to finish %s', kind, resource_ids, action)
+            return
+        try:
+            if kind == 'ec2':
+                waiter = get_client('ec2', region).get_waiter('instance_running' if action == 'start' else 'instance_stopped')
+                waiter.wait(InstanceIds=resource_ids, WaiterConfig={'Delay': WAVE_POLL_SECONDS, 'MaxAttempts': max(1, int(budget // WAVE_POLL_SECONDS))})
+            else:
+                wait_for_rds_status(get_client('rds', region), kind, resource_ids, 'available' if action == 'start' else 'stopped', budget)
+        except Exception as e:
+            logger.error('Error waiting for %s %s to finish %s: %s', kind, resource_ids, action, e)
+
+def wait_for_rds_status(rds_client, kind, resource_ids, status, timeout=WAVE_READY_TIMEOUT):
+    remaining = set(resource_ids)
+    deadline = time.monotonic() + timeout
+    while remaining:
+        for resource_id in list(remaining):
+            if kind == 'rds_cluster':
+                current = rds_client.describe_db_clusters(DBClusterIdentifier=resource_id)['DBClusters'][0]['Status']
+            else:
+                current = rds_client.describe_db_instances(DBInstanceIdentifier=resource_id)['DBInstances'][0]['DBInstanceStatus']
+            if current == status:
+                remaining.discard(resource_id)
+        if remaining:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f'{sorted(remaining)} did not reach {status}')
+            time.sleep(max(0, min(WAVE_POLL_SECONDS, deadline - time.monotonic())))
+
+def dispatch_stop_reason():
+    # A run that lost its lock would act alongside the new owner, and calls past the deadline
+    # would all fail; leaving the rest planned lets the next run pick it up
+    if run_lock_lost():
+        return 'run lock lost to another run'
+    if deadline_passed():
+        return 'run deadline passed'
     return None
 
+def dispatch_if_allowed(journal_path, batch, resource_details):
+    reason = dispatch_stop_reason()
+    if reason:
+        logger.error('Not dispatching %d actions: %s', len(batch), reason)
+        return []
+    return dispatch_batch(journal_path, batch, resource_details)
+
+def dispatch_in_waves(journal_path, planned, resource_details):
+    confirmed = []
+    for action in ('stop', 'start'):
+        entries = [entry for entry in planned if entry[4] == action]
+        if not entries:
+            continue
+        tags_by_key = {(entry[1], entry[2]): resource_details[(entry[1], entry[2])]['tags'] for entry in entries}
+        try:
+            wave_numbers = assign_waves(entries, tags_by_key)
+        except ValueError as e:
+            logger.error('Ignoring %s/%s tags: %s', WAVE_TAG, DEPENDS_ON_TAG, e)
+            wave_numbers = [0] * len(entries)
+        waves = group_waves(entries, wave_numbers, action)
+        confirmed.extend(run_waves(waves, lambda batch: dispatch_if_allowed(journal_path, batch, resource_details), wait_until_ready,
+                                   lambda wave: make_batches(wave, resource_details), should_stop=dispatch_stop_reason))
+    return confirmed
+
+def dispatch_held_in_waves(journal_path, held, streamed, depended_on, resource_details, versions):
+    """
+    Run the entries the pipeline held back for their Wave/DependsOn tags in waves. A dependency
+    only recognised after it was streamed is waited on before dependent starts; for stops it
+    already went first, which is logged.
+    """
+    append_entries(journal_path, held, PLANNED)
+    early = [entry for entry in streamed if entry[2] in depended_on or resource_details[(entry[1], entry[2])]['tags'].get('Name') in depended_on]
+    early_stops = [entry[2] for entry in early if entry[4] == 'stop']
+    if early_stops:
+        logger.warning('Stopped %s before the resources that depend on them, which were discovered later.', early_stops)
+    early_starts = [entry for entry in early if entry[4] == 'start']
+    if early_starts:
+        wait_until_ready(early_starts)
+    confirmed = dispatch_in_waves(journal_path, held, resource_details)
+    write_back_state(confirmed, resource_details, versions)
+    return confirmed
+
+def discover_region_resources(region, tag_key, tag_value, applied_windows, plans, all_ec2_instances, all_rds_clusters, all_rds_instances):
+    ec2_client = get_client('ec2', region)
+    rds_client = get_client('rds', region)
+
+    if DISCOVERY == 'tagging':
+        logger.info('Checking tagged resources in region: %s', region)
+        found = discover_region(get_client('resourcegroupstaggingapi', region), ec2_client, rds_client, plans, applied_windows)
+        steps = [('EC2 instances', lambda: found['ec2'], all_ec2_instances),
+                 ('RDS clusters', lambda: found['rds_cluster'], all_rds_clusters),
+                 ('RDS instances', lambda: found['rds_instance'], all_rds_instances)]
+    else:
+        steps = [('EC2 instances', lambda: get_instances_with_schedule_tag(ec2_client, tag_key, tag_value, applied_windows, plans), all_ec2_instances),
+                 ('RDS clusters', lambda: get_rds_clusters_with_schedule_tag(rds_client, tag_key, tag_value, applied_windows), all_rds_clusters),
+                 ('RDS instances', lambda: get_rds_instances_with_schedule_tag(rds_client, tag_key, tag_value, applied_windows), all_rds_instances)]
+
+    # Returns False when a step was skipped, so the caller knows some resources went unseen
+    complete = True
+    for label, discover, all_resources in steps:
+        logger.info('Checking %s in region: %s', label, region)
+        # A sick service endpoint (open circuit, timeouts) is skipped so the healthy ones still run
+        try:
+            with span(f'{label} {region}', 'discovery'):
+                resources = discover()
+        except CircuitOpenError as e:
+            logger.error('Skipping %s in %s: %s', label, region, e)
+            complete = False
+            continue
+        except RunDeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error('Error checking %s in %s: %s', label, region, e)
+            complete = False
+            continue
+        log_resources(logger, f"{label} in {region}", resources)
+        all_resources.extend(resources)
+    return complete
+
+def unresolved_plans(journal_path, due, windows):
+    """
+    Due plans whose transition window still has planned, dispatched or failed actions in the journal.
+    """
+    open_windows = {key[0] for key in outstanding_keys(journal_path)}
+    return {plan_name for plan_name in due if windows[plan_name] in open_windows}
+
+def advance_last_run(current_t, last_run, transitions=None, unresolved=()):
+    """
+    Record how far this run got. Transitions of unresolved plans (failed or skipped actions,
+    incomplete discovery) stay inside the next run's window; a run that lost its lock records nothing.
+    """
+    if run_lock_lost():
+        logger.error('Run lock was lost; leaving the last completed run unchanged.')
+        return
+    pending = [when for plan_name, (action, when) in (transitions or {}).items() if plan_name in unresolved]
+    processed_until = min(pending) - timedelta(minutes=1) if pending else current_t
+    if last_run is not None and processed_until < last_run:
+        processed_until = last_run
+    if pending:
+        logger.warning('Leaving %d plan transitions from %s on for the next run.', len(pending), min(pending).isoformat())
+    save_last_run(processed_until)
+
 def manage_instances():
     schedule = load_schedule()
     tag_key = 'Schedule'
     tag_value = 'On'
     regions = ['us-east-1', 'us-west-1', 'us-west-2']
 
+    tz = timezone('US/Eastern')
+    current_t = datetime.now(tz)
+    start_run()
+
+    # Only plans with a transition since the last completed run need any work; a late or slow
+    # run still applies the latest transition of each plan it missed
+    last_run = load_last_run()
+    with stage('transition index'):
+        index = build_transition_index(schedule)
+        transitions = transitions_since(index, last_run, current_t)
+    due = {plan_name: action for plan_name, (action, when) in transitions.items()}
+
+    boot_store = load_store()
+    if boot_store['pending']:
+        with stage('boot latency'):
+            observe_boot_latency(boot_store)
+    # With PRESTART=1, plans starting within the longest learned lead are also scanned
+    upcoming = {}
+    if PRESTART_ENABLED:
+        max_lead = max_lead_seconds(boot_store)
+        upcoming = {plan_name: minutes for plan_name, minutes in upcoming_starts(index, current_t, PRESTART_HORIZON_MINUTES).items()
+                    if plan_name not in due and minutes * 60 <= max_lead}
+    if not due and not upcoming:
+        save_store(boot_store)
+        advance_last_run(current_t, last_run)
+        logger.info('No plan transitions at %s.', current_t.strftime('%H:%M'))
+        return
+
+    # Resources tagged with a window due now were already handled. Pre-starts use the window of
+    # the start they anticipate, so the scheduled run later finds them done.
+    windows = {plan_name: transition_window(plan_name, action, when.astimezone(tz)) for plan_name, (action, when) in transitions.items()}
+    windows.update({plan_name: transition_window(plan_name, 'start', current_t + timedelta(minutes=minutes)) for plan_name, minutes in upcoming.items()})
+    versions = {windows[plan_name]: plan_version(schedule[plan_name]) for plan_name in windows}
+    applied_windows = set(versions.items())
+    hibernate_plans = {plan_name for plan_name in due if schedule[plan_name].get('hibernate')}
+
     all_ec2_instances = []
     all_rds_clusters = []
     all_rds_instances = []
 
-    for region in regions:
-        ec2_client = get_client('ec2', region)
-        rds_client = get_client('rds', region)
-        
-        logger.info(f"Checking EC2 instances in region: {region}")
-        ec2_instances = get_instances_with_schedule_tag(ec2_client, tag_key, tag_value)
-        logger.info(f"EC2 instances in {region}: {ec2_instances}")
-        all_ec2_instances.extend(ec2_instances)
-        
-        logger.info(f"Checking RDS clusters in region: {region}")
-        rds_clusters = get_rds_clusters_with_schedule_tag(rds_client, tag_key, tag_value)
-        logger.info(f"RDS clusters in {region}: {rds_clusters}")
-        all_rds_clusters.extend(rds_clusters)
-        
-        logger.info(f"Checking RDS instances in region: {region}")
-        rds_instances = get_rds_instances_with_schedule_tag(rds_client, tag_key, tag_value)
-        logger.info(f"RDS instances in {region}: {rds_instances}")
-        all_rds_instances.extend(rds_instances)
-
-    logger.info(f"All EC2 instances: {all_ec2_instances}")
-    logger.info(f"All RDS clusters: {all_rds_clusters}")
-    logger.info(f"All RDS instances: {all_rds_instances}")
+    if SCAN_PROCESSES:
+        # Worker processes parse responses on every core; actions are still dispatched from here
+        # with the scheduler's own credentials, so only the current account is scanned
+        with stage('discover'):
+            found, discovery_complete = scan_in_processes(regions, set(due) | set(upcoming), applied_windows)
+        all_ec2_instances.extend(found['ec2'])
+        all_rds_clusters.extend(found['rds_cluster'])
+        all_rds_instances.extend(found['rds_instance'])
+    else:
+        discovery_complete = True
+        for region in regions:
+            try:
+                with stage(f'discover {region}'):
+                    if not discover_region_resources(region, tag_key, tag_value, applied_windows, set(due) | set(upcoming), all_ec2_instances, all_rds_clusters, all_rds_instances):
+                        discovery_complete = False
+            except RunDeadlineExceeded as e:
+                # Out of time: act on what was found so far rather than nothing
+                logger.error('Stopping discovery at region %s: %s', region, e)
+                discovery_complete = False
+                break
+            except Exception as e:
+                logger.error('Error discovering resources in region %s: %s', region, e)
+                discovery_complete = False
+
+    log_resources(logger, 'All EC2 instances', all_ec2_instances)
+    log_resources(logger, 'All RDS clusters', all_rds_clusters)
+    log_resources(logger, 'All RDS instances', all_rds_instances)
     if not all_ec2_instances and not all_rds_clusters and not all_rds_instances:
-        logger.info(f'No instances or clusters found with tag {tag_key}.')
+        logger.info('No instances or clusters found with tag %s.', tag_key)
+        save_store(boot_store)
+        advance_last_run(current_t, last_run, transitions, set() if discovery_complete else set(due))
         return
 
+    planned = []
+    resource_details = {}
+    with stage('evaluate'):
+        for kind, resources in (('ec2', all_ec2_instances), ('rds_cluster', all_rds_clusters), ('rds_instance', all_rds_instances)):
+            by_plan = group_by_plan(resources)
+            for plan_name in due:
+                for resource in by_plan.get(plan_name, []):
+                    entry = decide_action(kind, resource, due, windows, resource_details, hibernate_plans)
+                    if entry:
+                        planned.append(entry)
+            for plan_name, minutes in upcoming.items():
+                for resource in by_plan.get(plan_name, []):
+                    entry = decide_prestart(kind, resource, minutes, windows, resource_details, boot_store)
+                    if entry:
+                        planned.append(entry)
+
+    # Skip work a previous (possibly interrupted) run already confirmed for the same transition, and
+    # settle what it left outstanding: confirmed if it took effect, otherwise planned again below
+    journal_path = get_journal_path()
+    with stage('journal'):
+        prune_journal(journal_path)
+        completed = completed_keys(journal_path)
+        outstanding = outstanding_keys(journal_path)
+        skipped = [p for p in planned if (p[0], p[1], p[2]) in completed]
+        planned = [p for p in planned if (p[0], p[1], p[2]) not in completed]
+        if skipped:
+            logger.info('Skipping %d actions already confirmed in the action journal.', len(skipped))
+        if outstanding:
+            settled = [entry for entry in (settled_entry(kind, resource, due, windows, outstanding)
+                                           for kind, resources in (('ec2', all_ec2_instances), ('rds_cluster', all_rds_clusters), ('rds_instance', all_rds_instances))
+                                           for resource in resources) if entry]
+            append_entries(journal_path, settled, CONFIRMED)
+            retried = sum(1 for p in planned if (p[0], p[1], p[2]) in outstanding)
+            logger.info('Retrying %d and settling %d actions left outstanding by an earlier run.', retried, len(settled))
+        append_entries(journal_path, planned, PLANNED)
+
+    with stage('dispatch'):
+        confirmed = dispatch_in_waves(journal_path, planned, resource_details)
+    with stage('state tags'):
+        write_back_state(confirmed, resource_details, versions)
+    with stage('history'):
+        record_history([(kind, resource) for kind, resources in (('ec2', all_ec2_instances), ('rds_cluster', all_rds_clusters), ('rds_instance', all_rds_instances))
+                        for resource in resources], confirmed, regions[0], current_t)
+    remember_starts(boot_store, confirmed, resource_details)
+    save_store(boot_store)
+    advance_last_run(current_t, last_run, transitions, set(due) if not discovery_complete else unresolved_plans(journal_path, due, windows))
+
+    logger.info('Successfully managed instances based on schedule.')
+
+def manage_instances_pipelined():
+    """
+    Act on resources while discovery is still running. Resources with Wave/DependsOn tags, and those
+    their DependsOn names, are held back and run in waves once the stream is done; resources outside
+    any dependency are not ordered against Wave-tagged ones. Pre-start runs only in manage_instances.
+    """
+    schedule = load_schedule()
+    tag_key = 'Schedule'
+    tag_value = 'On'
+    regions = ['us-east-1', 'us-west-1', 'us-west-2']
+
     tz = timezone('US/Eastern')
     current_t = datetime.now(tz)
-    current_day = current_t.isoweekday()
-    current_time = current_t.strftime('%H:%M')
-
-    for instance_id, region, plan_name, state in all_ec2_instances:
-        ec2_client = get_client('ec2', region)
-        if plan_name in schedule:
-            action = get_action(schedule[plan_name], current_day, current_time)
-            if action == 'start' and state == 'stopped':
-                start_ec2_instances(ec2_client, [instance_id])
-            elif action == 'stop' and state == 'running':
-                stop_ec2_instances(ec2_client, [instance_id])
-
-    for cluster_id, region, plan_name, status in all_rds_clusters:
-        rds_client = get_client('rds', region)
-        if plan_name in schedule:
-            action = get_action(schedule[plan_name], current_day, current_time)
-            if action == 'start' and status == 'stopped':
-                start_rds_cluster(rds_client, cluster_id)
-            elif action == 'stop' and status == 'available':
-                stop_rds_cluster(rds_client, cluster_id)
-    
-    for instance_id, region, plan_name, status in all_rds_instances:
-        rds_client = get_client('rds', region)
-        if plan_name in schedule:
-            action = get_action(schedule[plan_name], current_day, current_time)
-            if action == 'start' and status == 'stopped':
-                start_rds_instance(rds_client, instance_id)
-            elif action == 'stop' and status == 'available':
-                stop_rds_instance(rds_client, instance_id)
-
-    logger.info(f'Successfully managed instances based on schedule.')
+    start_run()
+
+    last_run = load_last_run()
+    transitions = transitions_since(build_transition_index(schedule), last_run, current_t)
+    due = {plan_name: action for plan_name, (action, when) in transitions.items()}
+    if not due:
+        advance_last_run(current_t, last_run)
+        logger.info('No plan transitions at %s.', current_t.strftime('%H:%M'))
+        return
+
+    windows = {plan_name: transition_window(plan_name, action, when.astimezone(tz)) for plan_name, (action, when) in transitions.items()}
+    versions = {windows[plan_name]: plan_version(schedule[plan_name]) for plan_name in due}
+    applied_windows = set(versions.items())
+    hibernate_plans = {plan_name for plan_name in due if schedule[plan_name].get('hibernate')}
+
+    journal_path = get_journal_path()
+    prune_journal(journal_path)
+    completed = completed_keys(journal_path)
+    outstanding = outstanding_keys(journal_path)
+    resource_details = {}
+
+    # One producer per (region, resource kind) so a slow region never blocks the others
+    sources = []
+    for region in regions:
+        if DISCOVERY == 'tagging':
+            sources.append(lambda region=region: ((kind, resource) for kind, resources in discover_region(
+                get_client('resourcegroupstaggingapi', region), get_client('ec2', region), get_client('rds', region), due, applied_windows).items() for resource in resources))
+            continue
+        sources.append(lambda region=region: (('ec2', resource) for resource in iter_instances_with_schedule_tag(get_client('ec2', region), tag_key, tag_value, applied_windows, due)))
+        sources.append(lambda region=region: (('rds_cluster', resource) for resource in iter_rds_clusters_with_schedule_tag(get_client('rds', region), tag_key, tag_value, applied_windows)))
+        sources.append(lambda region=region: (('rds_instance', resource) for resource in iter_rds_instances_with_schedule_tag(get_client('rds', region), tag_key, tag_value, applied_windows)))
+
+    observed = []
+    settled = []
+    # Entries with Wave/DependsOn tags, and the ones those name, skip the stream and run in waves at the end
+    held = []
+    depended_on = set()
+
+    def decide(item):
+        kind, resource = item
+        observed.append(item)
+        entry = decide_action(kind, resource, due, windows, resource_details, hibernate_plans)
+        if entry and (entry[0], entry[1], entry[2]) not in completed:
+            tags = resource_details[(kind, entry[2])]['tags']
+            if WAVE_TAG in tags or DEPENDS_ON_TAG in tags or entry[2] in depended_on or tags.get('Name') in depended_on:
+                depended_on.update(resource_dependencies(tags))
+                held.append(entry)
+                return None
+            return entry
+        if not entry and outstanding:
+            entry = settled_entry(kind, resource, due, windows, outstanding)
+            if entry:
+                settled.append(entry)
+        return None
+
+    def dispatch(batch):
+        # Journalled first, so a batch skipped below stays outstanding and holds last_run back
+        append_entries(journal_path, batch, PLANNED)
+        reason = dispatch_stop_reason()
+        if reason:
+            logger.error('Not dispatching %d actions: %s', len(batch), reason)
+            return []
+        confirmed = [entry for unit in make_batches(batch, resource_details) for entry in dispatch_if_allowed(journal_path, unit, resource_details)]
+        write_back_state(confirmed, resource_details, versions)
+        return confirmed
+
+    with stage('pipeline'):
+        confirmed, errors = run_pipeline(sources, decide, lambda entry: (entry[1], entry[3], entry[4]), dispatch)
+    logger.info('Pipeline confirmed %d actions with %d errors.', len(confirmed), len(errors))
+    if held:
+        with stage('waves'):
+            confirmed.extend(dispatch_held_in_waves(journal_path, held, confirmed, depended_on, resource_details, versions))
+    append_entries(journal_path, settled, CONFIRMED)
+    record_history(observed, confirmed, regions[0], current_t)
+    # Pre-start itself runs in manage_instances; the pipeline only feeds the latency history
+    boot_store = load_store()
+    remember_starts(boot_store, confirmed, resource_details)
+    save_store(boot_store)
+    # Errors may mean unseen resources; which plans they belonged to is unknown
+    advance_last_run(current_t, last_run, transitions, set(due) if errors else unresolved_plans(journal_path, due, windows))
 
 if __name__ == "__main__":
-    manage_instances()
+    with hold_run_lock() as acquired:
+        if not acquired:
+            logger.info('Another scheduler run holds the run lock; skipping.')
+        else:
+            run = manage_instances_pipelined if os.getenv('PIPELINE') == '1' else manage_instances
+            if SCHEDULER_TRACE:
+                run = functools.partial(trace_run, run)
+            if SCHEDULER_PROFILE:
+                profile_run(run)
+            else:
+                run()
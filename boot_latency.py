@@ -0,0 +1,96 @@
+import json
+import os
+import time
+
+BOOT_LATENCY_FILE = os.getenv('BOOT_LATENCY_FILE', 'boot_latency.json')
+# PRESTART=1 issues starts early by each resource's learned time-to-ready
+PRESTART_ENABLED = os.getenv('PRESTART') == '1'
+PRESTART_HORIZON_MINUTES = int(os.getenv('PRESTART_HORIZON_MINUTES', '30'))
+# Weight of the newest sample in the moving average, and headroom added to the estimate
+EWMA_ALPHA = 0.3
+SAFETY_FACTOR = 1.2
+# Starts not seen ready within this many seconds are dropped rather than learned from
+PENDING_MAX_AGE = 3600
+
+def load_store(path=BOOT_LATENCY_FILE):
+    """
+    Load learned boot latencies and in-flight starts.
+    """
+    if not os.path.exists(path):
+        return {'resources': {}, 'types': {}, 'pending': {}}
+    with open(path, 'r') as file:
+        return json.load(file)
+
+def save_store(store, path=BOOT_LATENCY_FILE):
+    """
+    Persist the store atomically.
+    """
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(store, file)
+    os.replace(tmp_path, path)
+
+def resource_key(kind, resource_id):
+    return f'{kind}:{resource_id}'
+
+def type_key(kind, resource_type):
+    return f'{kind}:{resource_type}'
+
+def record_starts(store, starts, when=None):
+    """
+    Remember dispatched starts as (kind, resource_id, region, resource_type) so readiness can be timed.
+    """
+    when = when or time.time()
+    for kind, resource_id, region, resource_type in starts:
+        store['pending'][resource_key(kind, resource_id)] = {
+            'kind': kind, 'id': resource_id, 'region': region, 'type': resource_type, 'started_at': when,
+        }
+
+def _update(table, key, sample):
+    table[key] = sample if key not in table else (1 - EWMA_ALPHA) * table[key] + EWMA_ALPHA * sample
+
+def record_ready(store, kind, resource_id, when=None):
+    """
+    Turn a pending start that is now ready into a latency sample for the resource and its type.
+    """
+    pending = store['pending'].pop(resource_key(kind, resource_id), None)
+    if pending is None:
+        return None
+    sample = (when or time.time()) - pending['started_at']
+    _update(store['resources'], resource_key(kind, resource_id), sample)
+    if pending.get('type'):
+        _update(store['types'], type_key(kind, pending['type']), sample)
+    return sample
+
+def expire_pending(store, now=None):
+    """
+    Drop starts that never reported ready within PENDING_MAX_AGE.
+    """
+    now = now or time.time()
+    store['pending'] = {key: value for key, value in store['pending'].items() if now - value['started_at'] < PENDING_MAX_AGE}
+
+def pending_by_region(store):
+    """
+    Group in-flight starts by (kind, region) for batched describe calls.
+    """
+    groups = {}
+    for pending in store['pending'].values():
+        groups.setdefault((pending['kind'], pending['region']), []).append(pending['id'])
+    return groups
+
+def lead_seconds(store, kind, resource_id, resource_type=None):
+    """
+    Estimate how long before the scheduled minute a start must be issued.
+    Uses the resource's own history, then its type's, and 0 when nothing has been learned yet.
+    """
+    learned = store['resources'].get(resource_key(kind, resource_id))
+    if learned is None and resource_type:
+        learned = store['types'].get(type_key(kind, resource_type))
+    return (learned or 0) * SAFETY_FACTOR
+
+def max_lead_seconds(store):
+    """
+    The longest lead any resource or type needs; bounds how far ahead pre-start has to look.
+    """
+    learned = list(store['resources'].values()) + list(store['types'].values())
+    return max(learned, default=0) * SAFETY_FACTOR
@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from botocore.awsrequest import AWSResponse
+from state_tags import LAST_ACTION_TIME_TAG, WINDOW_TAG
+
+# CASSETTE_MODE=record captures responses, CASSETTE_MODE=replay serves them back
+CASSETTE_MODE = os.getenv('CASSETTE_MODE')
+CASSETTE_DIR = os.getenv('CASSETTE_DIR', 'cassettes')
+# Multiplier applied to recorded latencies on replay; 0 replays as fast as possible
+CASSETTE_LATENCY_SCALE = float(os.getenv('CASSETTE_LATENCY_SCALE', '1.0'))
+
+# Request values that change from run to run: timestamps written into state tags, and the due plans
+# a discovery filter names. They are left out of the key so a cassette replays at any minute.
+VOLATILE_TAG_KEYS = (LAST_ACTION_TIME_TAG, WINDOW_TAG)
+PLAN_FILTERS = ('tag:Plan', 'Plan')
+
+_lock = threading.Lock()
+_tapes = {}
+
+def cassette_path(directory, service, region):
+    """
+    Return the cassette file used for one service in one region.
+    """
+    return os.path.join(directory, f'{service}-{region}.ndjson')
+
+def normalize(value):
+    """
+    Copy request parameters with the volatile tag values and plan filter values blanked.
+    """
+    if isinstance(value, list):
+        return [normalize(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    normalized = {key: normalize(item) for key, item in value.items()}
+    if normalized.get('Key') in VOLATILE_TAG_KEYS and 'Value' in normalized:
+        normalized['Value'] = '*'
+    if (normalized.get('Name') in PLAN_FILTERS or normalized.get('Key') in PLAN_FILTERS) and 'Values' in normalized:
+        normalized['Values'] = ['*']
+    return normalized
+
+def request_key(operation, params):
+    """
+    Build a stable lookup key from an operation name and its normalized API parameters.
+    """
+    return f'{operation}:{json.dumps(normalize(params), sort_keys=True, default=str)}'
+
+def _remember_key(params, model, context, **kwargs):
+    context['cassette_key'] = request_key(model.name, params)
+    context['cassette_start'] = time.perf_counter()
+
+def _load_tape(path):
+    with _lock:
+        if path not in _tapes:
+            tape = defaultdict(deque)
+            with open(path, 'r') as file:
+                for line in file:
+                    entry = json.loads(line)
+                    tape[entry['key']].append(entry)
+            _tapes[path] = tape
+        return _tapes[path]
+
+def attach_recorder(client, directory=CASSETTE_DIR):
+    """
+    Append every response the client receives, with its latency, to the cassette.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = cassette_path(directory, client.meta.service_model.service_name, client.meta.region_name)
+
+    def record(http_response, parsed, model, context, **kwargs):
+        entry = {
+            'key': context.get('cassette_key', model.name),
+            'operation': model.name,
+            'status': http_response.status_code,
+            'latency': time.perf_counter() - context.get('cassette_start', time.perf_counter()),
+            'parsed': parsed,
+        }
+        line = json.dumps(entry, default=str)
+        with _lock:
+            with open(path, 'a') as file:
+                file.write(line + '\n')
+
+    client.meta.events.register('before-parameter-build', _remember_key)
+    client.meta.events.register('after-call', record)
+    return client
+
+def attach_player(client, directory=CASSETTE_DIR, latency_scale=CASSETTE_LATENCY_SCALE):
+    """
+    Serve responses from the cassette instead of the network, sleeping for the recorded latency.
+    Repeated identical requests are answered in recorded order; the last answer is reused once exhausted.
+    The player runs after the other before-call hooks, so circuit checks and tracing still see each
+    call; before-send hooks (the run deadline check) do not run because nothing is sent.
+    """
+    path = cassette_path(directory, client.meta.service_model.service_name, client.meta.region_name)
+    tape = _load_tape(path)
+
+    def play(model, params, context, **kwargs):
+        key = context.get('cassette_key', model.name)
+        with _lock:
+            entries = tape.get(key)
+            if not entries:
+                raise KeyError(f'No recorded response for {key} in {path}')
+            entry = entries.popleft() if len(entries) > 1 else entries[0]
+        if latency_scale > 0:
+            time.sleep(entry['latency'] * latency_scale)
+        return AWSResponse(params.get('url', ''), entry['status'], {}, None), entry['parsed']
+
+    client.meta.events.register('before-parameter-build', _remember_key)
+    # The first before-call hook to return a response ends the chain, so the player goes last
+    client.meta.events.register_last('before-call', play)
+    return client
+
+def attach_cassette(client, mode=CASSETTE_MODE):
+    """
+    Attach a recorder or player to the client according to CASSETTE_MODE; no-op when unset.
+    """
+    if mode == 'record':
+        return attach_recorder(client)
+    if mode == 'replay':
+        return attach_player(client)
+    return client
@@ -0,0 +1,139 @@
+import argparse
+import json
+import logging
+import re
+from datetime import date, datetime, time, timedelta
+from pytz import timezone, utc
+from transition_index import DEFAULT_TIMEZONE
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+logger = logging.getLogger()
+
+_COMMENT = re.compile(r'("(?:\\.|[^"\\])*")|//[^\n]*')
+_CRON_LINES = re.compile(r'(?m)^(?P<indent>[ \t]*)- cron: .*\n(?:(?P=indent)- cron: .*\n)*')
+
+def load_schedule(file_path):
+    """
+    Load a schedule file, allowing the // comments used in Input.json.
+    """
+    with open(file_path, 'r') as file:
+        text = file.read()
+    return json.loads(_COMMENT.sub(lambda match: match.group(1) or '', text))
+
+def local_occurrences(local_day, clock, tz):
+    """
+    Return the UTC instants at which the scheduler sees local_day at clock in tz: none inside a
+    spring-forward gap, two for a time repeated when clocks fall back.
+    """
+    naive = datetime.combine(local_day, clock)
+    instants = set()
+    for is_dst in (True, False):
+        aware = tz.normalize(tz.localize(naive, is_dst=is_dst))
+        if aware.replace(tzinfo=None) == naive:
+            instants.add(aware.astimezone(utc))
+    return instants
+
+def transition_instants(schedule, start, days=366):
+    """
+    Enumerate every start and stop transition in the schedule over the given number of days, in UTC.
+    A year of occurrences covers both sides of every DST change.
+    """
+    instants = set()
+    for plan_schedule in schedule.values():
+        tz = timezone(plan_schedule.get('timezone', DEFAULT_TIMEZONE))
+        transitions = [(plan_schedule['start_days'], time.fromisoformat(plan_schedule['start_time'])),
+                       (plan_schedule['stop_days'], time.fromisoformat(plan_schedule['stop_time']))]
+        for offset in range(days):
+            local_day = start + timedelta(days=offset)
+            for weekdays, clock in transitions:
+                if local_day.isoweekday() in weekdays:
+                    instants |= local_occurrences(local_day, clock, tz)
+    return instants
+
+def compile_triggers(instants):
+    """
+    Group UTC instants into cron fields (minutes, hours, weekdays, months). Each group is an exact
+    cross product of its minutes and hours, so no trigger fires at a time of day with no transition;
+    weekdays and months are the union over the year, which may add harmless extra fires around DST.
+    """
+    by_time = {}
+    for instant in instants:
+        weekdays, months = by_time.setdefault((instant.minute, instant.hour), (set(), set()))
+        weekdays.add(instant.isoweekday())
+        months.add(instant.month)
+
+    by_minute = {}
+    for (minute, hour), (weekdays, months) in by_time.items():
+        by_minute.setdefault((minute, frozenset(weekdays), frozenset(months)), set()).add(hour)
+
+    grouped = {}
+    for (minute, weekdays, months), hours in by_minute.items():
+        grouped.setdefault((frozenset(hours), weekdays, months), set()).add(minute)
+    return sorted(((sorted(minutes), sorted(hours), sorted(weekdays), sorted(months))
+                   for (hours, weekdays, months), minutes in grouped.items()),
+                  key=lambda trigger: (trigger[1], trigger[0]))
+
+def format_field(values, full_range):
+    """
+    Render values as a cron list, collapsing runs of three or more into ranges and the full set to '*'.
+    """
+    if set(values) == set(full_range):
+        return '*'
+    parts = []
+    run = [values[0]]
+    for value in values[1:] + [None]:
+        if value is not None and value == run[-1] + 1:
+            run.append(value)
+            continue
+        parts.append(f'{run[0]}-{run[-1]}' if len(run) >= 3 else ','.join(str(item) for item in run))
+        run = [value]
+    return ','.join(parts)
+
+def to_cron(trigger, style='github'):
+    """
+    Render a trigger as a five-field UTC cron line (GitHub Actions) or an EventBridge cron() expression.
+    """
+    minutes, hours, weekdays, months = trigger
+    minute_field = format_field(minutes, range(60))
+    hour_field = format_field(hours, range(24))
+    month_field = format_field(months, range(1, 13))
+    if style == 'eventbridge':
+        # EventBridge numbers Sunday as 1 and needs '?' in one of the day fields
+        day_field = format_field(sorted(day % 7 + 1 for day in weekdays), range(1, 8))
+        if day_field == '*':
+            return f'cron({minute_field} {hour_field} * {month_field} ? *)'
+        return f'cron({minute_field} {hour_field} ? {month_field} {day_field} *)'
+    return f'{minute_field} {hour_field} * {month_field} {format_field(sorted(day % 7 for day in weekdays), range(7))}'
+
+def update_workflow(file_path, lines):
+    """
+    Replace the '- cron:' entries of a GitHub Actions workflow's schedule block with lines.
+    """
+    with open(file_path, 'r') as file:
+        text = file.read()
+    match = _CRON_LINES.search(text)
+    if not match:
+        raise ValueError(f'No "- cron:" entries found in {file_path}')
+    block = ''.join(f"{match.group('indent')}- cron: '{line}'\n" for line in lines)
+    with open(file_path, 'w') as file:
+        file.write(text[:match.start()] + block + text[match.end():])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile a schedule into the minimal set of UTC cron triggers.")
+    parser.add_argument("--schedule", default="schedule.json", help="Schedule file (// comments allowed)")
+    parser.add_argument("--style", choices=["github", "eventbridge"], default="github", help="Cron dialect to emit")
+    parser.add_argument("--start", help="First day of the year to cover (YYYY-MM-DD); defaults to today")
+    parser.add_argument("--workflow", help="GitHub Actions workflow whose cron entries should be replaced")
+
+    args = parser.parse_args()
+    start = date.fromisoformat(args.start) if args.start else date.today()
+    schedule_data = load_schedule(args.schedule)
+    instants = transition_instants(schedule_data, start)
+    lines = [to_cron(trigger, args.style) for trigger in compile_triggers(instants)]
+
+    for line in lines:
+        print(line)
+    logger.info('%d expressions cover %d transitions over the next year', len(lines), len(instants))
+    if args.workflow:
+        update_workflow(args.workflow, lines)
+        logger.info('Updated cron entries in %s', args.workflow)
@@ -0,0 +1,84 @@
+import logging
+import re
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger()
+
+EC2_BATCH_SIZE = 100
+INSTANCE_ID_PATTERN = re.compile(r'\bi-[0-9a-f]{8,17}\b')
+# Throttling says nothing about the IDs in the batch; botocore has already retried it by the time it surfaces
+THROTTLING_CODES = ('RequestLimitExceeded', 'Throttling', 'ThrottlingException')
+
+def offending_instance_ids(error, batch):
+    """
+    Extract the instance IDs named in an EC2 error message that belong to the batch.
+    """
+    message = error.response.get('Error', {}).get('Message', '')
+    named = set(INSTANCE_ID_PATTERN.findall(message))
+    return [instance_id for instance_id in batch if instance_id in named]
+
+def bisect_batch(call, instance_ids):
+    """
+    Call a multi-instance EC2 operation, isolating the IDs that make the batch fail.
+    IDs named in the error are dropped and the rest retried as one batch; when the error
+    names no IDs the batch is split in half. Throttling or any error that is not about the
+    IDs (timeouts, the run deadline, an open circuit) ends the bisection: every ID not yet
+    called is reported failed with that error. Returns (succeeded_ids, [(failed_id, error_code)], aborted).
+    """
+    succeeded = []
+    failed = []
+    pending = [list(instance_ids)]
+    while pending:
+        batch = pending.pop()
+        if not batch:
+            continue
+        try:
+            call(batch)
+            succeeded.extend(batch)
+            continue
+        except ClientError as e:
+            code = e.response.get('Error', {}).get('Code', '')
+            if code not in THROTTLING_CODES:
+                offending = offending_instance_ids(e, batch)
+                if offending:
+                    failed.extend((instance_id, code) for instance_id in offending)
+                    pending.append([instance_id for instance_id in batch if instance_id not in offending])
+                elif len(batch) == 1:
+                    failed.append((batch[0], code))
+                else:
+                    middle = len(batch) // 2
+                    pending.append(batch[middle:])
+                    pending.append(batch[:middle])
+                continue
+            error = e
+        except Exception as e:
+            code = type(e).__name__
+            error = e
+        untried = batch + [instance_id for remaining in pending for instance_id in remaining]
+        logger.error('Giving up on %d EC2 instances after %s: %s', len(untried), code, error)
+        failed.extend((instance_id, code) for instance_id in untried)
+        return succeeded, failed, True
+    return succeeded, failed, False
+
+def call_with_bisection(call, instance_ids):
+    """
+    bisect_batch without the aborted flag. Returns (succeeded_ids, [(failed_id, error_code)]).
+    """
+    succeeded, failed, aborted = bisect_batch(call, instance_ids)
+    return succeeded, failed
+
+def call_in_batches(call, instance_ids, batch_size=EC2_BATCH_SIZE):
+    """
+    Run bisect_batch over fixed-size chunks of instance IDs. Once a chunk is aborted the
+    remaining chunks are not called and are reported failed with the same error code.
+    """
+    succeeded = []
+    failed = []
+    for i in range(0, len(instance_ids), batch_size):
+        ok, bad, aborted = bisect_batch(call, instance_ids[i:i + batch_size])
+        succeeded.extend(ok)
+        failed.extend(bad)
+        if aborted:
+            failed.extend((instance_id, bad[-1][1]) for instance_id in instance_ids[i + batch_size:])
+            break
+    return succeeded, failed
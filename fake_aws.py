@@ -0,0 +1,416 @@
+import argparse
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+from xml.sax.saxutils import escape
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+logger = logging.getLogger()
+
+EC2_NS = 'http://ec2.amazonaws.com/doc/2016-11-15/'
+RDS_NS = 'http://rds.amazonaws.com/doc/2014-10-31/'
+STS_NS = 'https://sts.amazonaws.com/doc/2011-06-15/'
+ACCOUNT_ID = '123456789012'
+EC2_STATE_CODES = {'pending': 0, 'running': 16, 'stopping': 64, 'stopped': 80}
+CREDENTIAL_SCOPE = re.compile(r'Credential=[^/]+/\d{8}/([^/]+)/([^/]+)/')
+
+DEFAULT_CONFIG = {
+    # Per-action latency in milliseconds; 'default' applies to actions not listed
+    'latency_ms': {'default': {'distribution': 'lognormal', 'median': 40, 'sigma': 0.5}},
+    # Fraction of calls answered with a throttling error
+    'throttle_rate': {'default': 0.0},
+    # Seconds a resource spends in pending/stopping (EC2) or starting/stopping (RDS)
+    'transition_seconds': {'ec2': 30, 'rds': 300},
+    # Items per page when the caller does not ask for a page size
+    'page_size': {'ec2': 1000, 'rds': 100, 'tagging': 100},
+}
+
+class FakeFleet:
+    """
+    In-memory EC2 and RDS resources with timed state transitions.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.Lock()
+        self.ec2 = {}
+        self.rds_instances = {}
+        self.rds_clusters = {}
+
+    def populate(self, regions, plans, ec2_per_region, rds_instances_per_region, rds_clusters_per_region, hibernation_rate=0.0):
+        for region in regions:
+            for i in range(ec2_per_region):
+                instance_id = f'i-{random.getrandbits(64):017x}'
+                self.ec2[instance_id] = {
+                    'id': instance_id,
+                    'region': region,
+                    'type': random.choice(['t3.micro', 't3.large', 'm5.xlarge', 'm5.4xlarge', 'c5.2xlarge']),
+                    'state': random.choice(['running', 'stopped']),
+                    'hibernation': random.random() < hibernation_rate,
+                    'tags': {'Name': f'ec2-{region}-{i}', 'Schedule': 'On', 'Plan': random.choice(plans)},
+                }
+            for i in range(rds_instances_per_region):
+                identifier = f'db-{region}-{i}'
+                self.rds_instances[(region, identifier)] = {
+                    'id': identifier,
+                    'region': region,
+                    'arn': f'arn:aws:rds:{region}:{ACCOUNT_ID}:db:{identifier}',
+                    'state': random.choice(['available', 'stopped']),
+                    'tags': {'Schedule': 'On', 'Plan': random.choice(plans)},
+                }
+            for i in range(rds_clusters_per_region):
+                identifier = f'cluster-{region}-{i}'
+                self.rds_clusters[(region, identifier)] = {
+                    'id': identifier,
+                    'region': region,
+                    'arn': f'arn:aws:rds:{region}:{ACCOUNT_ID}:cluster:{identifier}',
+                    'state': random.choice(['available', 'stopped']),
+                    'tags': {'Schedule': 'On', 'Plan': random.choice(plans)},
+                }
+
+    def settle(self, resource):
+        if resource.get('ready_at') and time.monotonic() >= resource['ready_at']:
+            resource['state'] = resource.pop('target')
+            resource.pop('ready_at')
+        return resource
+
+    def transition(self, resource, service, allowed_from, interim, target):
+        self.settle(resource)
+        if resource['state'] not in allowed_from:
+            return False
+        resource['state'] = interim
+        resource['target'] = target
+        resource['ready_at'] = time.monotonic() + self.config['transition_seconds'][service]
+        return True
+
+def member_list(params, prefix):
+    """
+    Collect numbered query parameters such as InstanceId.1, InstanceId.2 into a list.
+    """
+    values = []
+    i = 1
+    while f'{prefix}.{i}' in params:
+        values.append(params[f'{prefix}.{i}'])
+        i += 1
+    return values
+
+def paginate(items, params, token_name, size_name, default_size):
+    start = int(params.get(token_name) or 0)
+    size = int(params.get(size_name) or default_size)
+    page = items[start:start + size]
+    next_token = str(start + size) if start + size < len(items) else None
+    return page, next_token
+
+def tag_set_xml(tags):
+    return ''.join(f'<item><key>{escape(k)}</key><value>{escape(v)}</value></item>' for k, v in tags.items())
+
+def rds_tag_list_xml(tags):
+    return ''.join(f'<Tag><Key>{escape(k)}</Key><Value>{escape(v)}</Value></Tag>' for k, v in tags.items())
+
+def ec2_instance_xml(instance):
+    return (
+        f'<item><instanceId>{instance["id"]}</instanceId><instanceType>{instance["type"]}</instanceType>'
+        f'<instanceState><code>{EC2_STATE_CODES[instance["state"]]}</code><name>{instance["state"]}</name></instanceState>'
+        f'<hibernationOptions><configured>{str(instance["hibernation"]).lower()}</configured></hibernationOptions>'
+        f'<tagSet>{tag_set_xml(instance["tags"])}</tagSet></item>'
+    )
+
+def ec2_filters_match(instance, filters):
+    for name, values in filters:
+        if name.startswith('tag:'):
+            if instance['tags'].get(name[4:]) not in values:
+                return False
+        elif name == 'tag-key':
+            if not any(key in instance['tags'] for key in values):
+                return False
+        elif name == 'instance-id':
+            if instance['id'] not in values:
+                return False
+        elif name == 'instance-state-name':
+            if instance['state'] not in values:
+                return False
+    return True
+
+class FakeAwsHandler(BaseHTTPRequestHandler):
+    fleet = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+        match = CREDENTIAL_SCOPE.search(self.headers.get('Authorization', ''))
+        region, service = match.groups() if match else ('us-east-1', 'ec2')
+        target = self.headers.get('X-Amz-Target')
+        if target:
+            # JSON protocol (Resource Groups Tagging API): the operation is named in the target header
+            params = json.loads(body or '{}')
+            action = target.rsplit('.', 1)[-1]
+        else:
+            params = {key: values[0] for key, values in parse_qs(body, keep_blank_values=True).items()}
+            action = params.get('Action', '')
+        config = self.fleet.config
+
+        latency = config['latency_ms'].get(action, config['latency_ms']['default'])
+        time.sleep(sample_latency(latency) / 1000.0)
+        if random.random() < config['throttle_rate'].get(action, config['throttle_rate']['default']):
+            if service == 'ec2':
+                return self.ec2_error(503, 'RequestLimitExceeded', 'Request limit exceeded.')
+            if target:
+                return self.json_error(400, 'ThrottledException', 'Rate exceeded')
+            return self.rds_error(400, 'Throttling', 'Rate exceeded')
+
+        handler = getattr(self, f'{service}_{action}', None)
+        if handler is None:
+            if service == 'ec2':
+                return self.ec2_error(400, 'InvalidAction', f'The action {action} is not valid for this web service.')
+            if target:
+                return self.json_error(400, 'InvalidAction', f'Could not find operation {action}')
+            return self.rds_error(400, 'InvalidAction', f'Could not find operation {action}')
+        with self.fleet.lock:
+            return handler(region, params)
+
+    def send_xml(self, status, xml):
+        payload = ('<?xml version="1.0" encoding="UTF-8"?>' + xml).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/xml')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def ec2_ok(self, action, inner):
+        self.send_xml(200, f'<{action}Response xmlns="{EC2_NS}"><requestId>{uuid.uuid4()}</requestId>{inner}</{action}Response>')
+
+    def ec2_error(self, status, code, message):
+        self.send_xml(status, f'<Response><Errors><Error><Code>{code}</Code><Message>{escape(message)}</Message></Error></Errors><RequestID>{uuid.uuid4()}</RequestID></Response>')
+
+    def rds_ok(self, action, inner):
+        self.send_xml(200, f'<{action}Response xmlns="{RDS_NS}"><{action}Result>{inner}</{action}Result><ResponseMetadata><RequestId>{uuid.uuid4()}</RequestId></ResponseMetadata></{action}Response>')
+
+    def rds_error(self, status, code, message):
+        self.send_xml(status, f'<ErrorResponse xmlns="{RDS_NS}"><Error><Type>Sender</Type><Code>{code}</Code><Message>{escape(message)}</Message></Error><RequestId>{uuid.uuid4()}</RequestId></ErrorResponse>')
+
+    def send_json(self, status, document):
+        payload = json.dumps(document).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/x-amz-json-1.1')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def json_error(self, status, code, message):
+        self.send_json(status, {'__type': code, 'Message': message})
+
+    def ec2_DescribeInstances(self, region, params):
+        filters = []
+        i = 1
+        while f'Filter.{i}.Name' in params:
+            filters.append((params[f'Filter.{i}.Name'], member_list(params, f'Filter.{i}.Value')))
+            i += 1
+        instance_ids = member_list(params, 'InstanceId')
+        if instance_ids:
+            filters.append(('instance-id', instance_ids))
+        instances = [self.fleet.settle(instance) for instance in self.fleet.ec2.values() if instance['region'] == region]
+        instances = [instance for instance in instances if ec2_filters_match(instance, filters)]
+        page, next_token = paginate(instances, params, 'NextToken', 'MaxResults', self.fleet.config['page_size']['ec2'])
+        reservations = ''.join(f'<item><reservationId>r-{instance["id"][2:]}</reservationId><ownerId>{ACCOUNT_ID}</ownerId><instancesSet>{ec2_instance_xml(instance)}</instancesSet></item>' for instance in page)
+        token = f'<nextToken>{next_token}</nextToken>' if next_token else ''
+        self.ec2_ok('DescribeInstances', f'<reservationSet>{reservations}</reservationSet>{token}')
+
+    def ec2_change_state(self, region, params, action, allowed_from, interim, target):
+        instance_ids = member_list(params, 'InstanceId')
+        missing = [instance_id for instance_id in instance_ids if instance_id not in self.fleet.ec2 or self.fleet.ec2[instance_id]['region'] != region]
+        if missing:
+            return self.ec2_error(400, 'InvalidInstanceID.NotFound', f"The instance IDs '{', '.join(missing)}' do not exist")
+        for instance_id in instance_ids:
+            instance = self.fleet.settle(self.fleet.ec2[instance_id])
+            if instance['state'] not in allowed_from and instance['state'] not in (interim, target):
+                verb = 'started' if action == 'StartInstances' else 'stopped'
+                return self.ec2_error(400, 'IncorrectInstanceState', f"The instance '{instance_id}' is not in a state from which it can be {verb}.")
+        items = ''
+        for instance_id in instance_ids:
+            instance = self.fleet.ec2[instance_id]
+            previous = instance['state']
+            self.fleet.transition(instance, 'ec2', allowed_from, interim, target)
+            items += (f'<item><instanceId>{instance_id}</instanceId>'
+                      f'<currentState><code>{EC2_STATE_CODES[instance["state"]]}</code><name>{instance["state"]}</name></currentState>'
+                      f'<previousState><code>{EC2_STATE_CODES[previous]}</code><name>{previous}</name></previousState></item>')
+        self.ec2_ok(action, f'<instancesSet>{items}</instancesSet>')
+
+    def ec2_StartInstances(self, region, params):
+        self.ec2_change_state(region, params, 'StartInstances', ('stopped',), 'pending', 'running')
+
+    def ec2_StopInstances(self, region, params):
+        if params.get('Hibernate') == 'true':
+            not_configured = [instance_id for instance_id in member_list(params, 'InstanceId')
+                              if instance_id in self.fleet.ec2 and not self.fleet.ec2[instance_id]['hibernation']]
+            if not_configured:
+                return self.ec2_error(400, 'UnsupportedHibernationConfiguration', f"The instance '{not_configured[0]}' does not have hibernation configured.")
+        self.ec2_change_state(region, params, 'StopInstances', ('running',), 'stopping', 'stopped')
+
+    def ec2_CreateTags(self, region, params):
+        tags = {}
+        i = 1
+        while f'Tag.{i}.Key' in params:
+            tags[params[f'Tag.{i}.Key']] = params.get(f'Tag.{i}.Value', '')
+            i += 1
+        for resource_id in member_list(params, 'ResourceId'):
+            if resource_id in self.fleet.ec2:
+                self.fleet.ec2[resource_id]['tags'].update(tags)
+        self.ec2_ok('CreateTags', '<return>true</return>')
+
+    def rds_describe(self, region, params, action, collection, member, status_key, arn_key, id_key):
+        resources = [self.fleet.settle(resource) for (resource_region, _), resource in collection.items() if resource_region == region]
+        identifier = params.get(id_key)
+        if identifier:
+            resources = [resource for resource in resources if resource['id'] == identifier]
+            if not resources:
+                code = 'DBClusterNotFoundFault' if member == 'DBCluster' else 'DBInstanceNotFound'
+                return self.rds_error(404, code, f'{identifier} not found.')
+        i = 1
+        while f'Filters.Filter.{i}.Name' in params:
+            # db-instance-id / db-cluster-id accept identifiers or ARNs
+            if params[f'Filters.Filter.{i}.Name'] in ('db-instance-id', 'db-cluster-id'):
+                wanted = set(member_list(params, f'Filters.Filter.{i}.Values.Value'))
+                resources = [resource for resource in resources if resource['id'] in wanted or resource['arn'] in wanted]
+            i += 1
+        page, marker = paginate(resources, params, 'Marker', 'MaxRecords', self.fleet.config['page_size']['rds'])
+        items = ''.join(f'<{member}><{id_key}>{resource["id"]}</{id_key}><{arn_key}>{resource["arn"]}</{arn_key}><{status_key}>{resource["state"]}</{status_key}></{member}>' for resource in page)
+        marker_xml = f'<Marker>{marker}</Marker>' if marker else ''
+        self.rds_ok(action, f'<{member}s>{items}</{member}s>{marker_xml}')
+
+    def rds_DescribeDBInstances(self, region, params):
+        self.rds_describe(region, params, 'DescribeDBInstances', self.fleet.rds_instances, 'DBInstance', 'DBInstanceStatus', 'DBInstanceArn', 'DBInstanceIdentifier')
+
+    def rds_DescribeDBClusters(self, region, params):
+        self.rds_describe(region, params, 'DescribeDBClusters', self.fleet.rds_clusters, 'DBCluster', 'Status', 'DBClusterArn', 'DBClusterIdentifier')
+
+    def find_by_arn(self, arn):
+        for collection in (self.fleet.rds_instances, self.fleet.rds_clusters):
+            for resource in collection.values():
+                if resource['arn'] == arn:
+                    return resource
+        return None
+
+    def rds_ListTagsForResource(self, region, params):
+        resource = self.find_by_arn(params.get('ResourceName'))
+        if resource is None:
+            return self.rds_error(404, 'DBInstanceNotFound', f"{params.get('ResourceName')} not found.")
+        self.rds_ok('ListTagsForResource', f'<TagList>{rds_tag_list_xml(resource["tags"])}</TagList>')
+
+    def rds_AddTagsToResource(self, region, params):
+        resource = self.find_by_arn(params.get('ResourceName'))
+        if resource is None:
+            return self.rds_error(404, 'DBInstanceNotFound', f"{params.get('ResourceName')} not found.")
+        i = 1
+        while f'Tags.Tag.{i}.Key' in params:
+            resource['tags'][params[f'Tags.Tag.{i}.Key']] = params.get(f'Tags.Tag.{i}.Value', '')
+            i += 1
+        self.rds_ok('AddTagsToResource', '')
+
+    def rds_change_state(self, region, params, action, collection, member, id_key, status_key, allowed_from, interim, target, fault):
+        identifier = params.get(id_key)
+        resource = collection.get((region, identifier))
+        if resource is None:
+            return self.rds_error(404, 'DBInstanceNotFound' if member == 'DBInstance' else 'DBClusterNotFoundFault', f'{identifier} not found.')
+        if not self.fleet.transition(resource, 'rds', allowed_from, interim, target):
+            return self.rds_error(400, fault, f'{member} {identifier} is not in a valid state ({resource["state"]}).')
+        self.rds_ok(action, f'<{member}><{id_key}>{identifier}</{id_key}><{status_key}>{resource["state"]}</{status_key}></{member}>')
+
+    def rds_StartDBInstance(self, region, params):
+        self.rds_change_state(region, params, 'StartDBInstance', self.fleet.rds_instances, 'DBInstance', 'DBInstanceIdentifier', 'DBInstanceStatus', ('stopped',), 'starting', 'available', 'InvalidDBInstanceState')
+
+    def rds_StopDBInstance(self, region, params):
+        self.rds_change_state(region, params, 'StopDBInstance', self.fleet.rds_instances, 'DBInstance', 'DBInstanceIdentifier', 'DBInstanceStatus', ('available',), 'stopping', 'stopped', 'InvalidDBInstanceState')
+
+    def rds_StartDBCluster(self, region, params):
+        self.rds_change_state(region, params, 'StartDBCluster', self.fleet.rds_clusters, 'DBCluster', 'DBClusterIdentifier', 'Status', ('stopped',), 'starting', 'available', 'InvalidDBClusterStateFault')
+
+    def rds_StopDBCluster(self, region, params):
+        self.rds_change_state(region, params, 'StopDBCluster', self.fleet.rds_clusters, 'DBCluster', 'DBClusterIdentifier', 'Status', ('available',), 'stopping', 'stopped', 'InvalidDBClusterStateFault')
+
+    def sts_GetCallerIdentity(self, region, params):
+        self.send_xml(200, f'<GetCallerIdentityResponse xmlns="{STS_NS}"><GetCallerIdentityResult><Arn>arn:aws:iam::{ACCOUNT_ID}:user/fake</Arn>'
+                           f'<UserId>AIDAFAKE</UserId><Account>{ACCOUNT_ID}</Account></GetCallerIdentityResult>'
+                           f'<ResponseMetadata><RequestId>{uuid.uuid4()}</RequestId></ResponseMetadata></GetCallerIdentityResponse>')
+
+    def sts_AssumeRole(self, region, params):
+        expires = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(time.time() + 3600))
+        self.send_xml(200, f'<AssumeRoleResponse xmlns="{STS_NS}"><AssumeRoleResult><Credentials><AccessKeyId>ASIAFAKE</AccessKeyId>'
+                           f'<SecretAccessKey>fake</SecretAccessKey><SessionToken>fake</SessionToken><Expiration>{expires}</Expiration></Credentials>'
+                           f'<AssumedRoleUser><Arn>{params["RoleArn"]}/{params["RoleSessionName"]}</Arn><AssumedRoleId>AROAFAKE:{params["RoleSessionName"]}</AssumedRoleId></AssumedRoleUser>'
+                           f'</AssumeRoleResult><ResponseMetadata><RequestId>{uuid.uuid4()}</RequestId></ResponseMetadata></AssumeRoleResponse>')
+
+    def tagging_GetResources(self, region, params):
+        type_filters = set(params.get('ResourceTypeFilters') or ['ec2:instance', 'rds:db', 'rds:cluster'])
+        resources = []
+        if 'ec2:instance' in type_filters or 'ec2' in type_filters:
+            resources += [(f'arn:aws:ec2:{region}:{ACCOUNT_ID}:instance/{instance["id"]}', instance) for instance in self.fleet.ec2.values() if instance['region'] == region]
+        if 'rds:db' in type_filters or 'rds' in type_filters:
+            resources += [(resource['arn'], resource) for (resource_region, _), resource in self.fleet.rds_instances.items() if resource_region == region]
+        if 'rds:cluster' in type_filters or 'rds' in type_filters:
+            resources += [(resource['arn'], resource) for (resource_region, _), resource in self.fleet.rds_clusters.items() if resource_region == region]
+        for tag_filter in params.get('TagFilters', []):
+            key, values = tag_filter['Key'], tag_filter.get('Values')
+            resources = [(arn, resource) for arn, resource in resources if key in resource['tags'] and (not values or resource['tags'][key] in values)]
+        page, token = paginate(resources, params, 'PaginationToken', 'ResourcesPerPage', self.fleet.config['page_size']['tagging'])
+        self.send_json(200, {
+            'PaginationToken': token or '',
+            'ResourceTagMappingList': [{'ResourceARN': arn, 'Tags': [{'Key': k, 'Value': v} for k, v in resource['tags'].items()]} for arn, resource in page],
+        })
+
+def sample_latency(spec):
+    """
+    Draw one latency in milliseconds from a {'distribution': ..., ...} spec.
+    """
+    distribution = spec.get('distribution', 'fixed')
+    if distribution == 'lognormal':
+        return random.lognormvariate(0, spec.get('sigma', 0.5)) * spec['median']
+    if distribution == 'uniform':
+        return random.uniform(spec['low'], spec['high'])
+    return spec.get('value', 0)
+
+def make_server(fleet, host='127.0.0.1', port=0):
+    """
+    Build a threaded HTTP server for the fleet; port 0 picks a free port.
+    """
+    handler = type('BoundFakeAwsHandler', (FakeAwsHandler,), {'fleet': fleet})
+    return ThreadingHTTPServer((host, port), handler)
+
+def start_in_background(fleet, host='127.0.0.1', port=0):
+    """
+    Serve the fleet on a daemon thread and return (server, endpoint_url).
+    """
+    server = make_server(fleet, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{server.server_address[0]}:{server.server_address[1]}'
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a fake EC2/RDS/tagging endpoint for offline load tests.")
+    parser.add_argument("--port", type=int, default=4566, help="Port to listen on")
+    parser.add_argument("--regions", default="us-east-1,us-west-1,us-west-2", help="Comma-separated regions to populate")
+    parser.add_argument("--plans", default="office_hours", help="Comma-separated plan names to assign")
+    parser.add_argument("--ec2", type=int, default=1000, help="EC2 instances per region")
+    parser.add_argument("--rds-instances", type=int, default=50, help="RDS instances per region")
+    parser.add_argument("--rds-clusters", type=int, default=10, help="RDS clusters per region")
+    parser.add_argument("--hibernation-rate", type=float, default=0.0, help="Fraction of EC2 instances with hibernation configured")
+    parser.add_argument("--config", help="JSON file overriding latency, throttling, transition and page size settings")
+
+    args = parser.parse_args()
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    if args.config:
+        with open(args.config, 'r') as file:
+            for key, value in json.load(file).items():
+                config.setdefault(key, {}).update(value)
+
+    fleet = FakeFleet(config)
+    fleet.populate(args.regions.split(','), args.plans.split(','), args.ec2, args.rds_instances, args.rds_clusters, args.hibernation_rate)
+    server = make_server(fleet, port=args.port)
+    logger.info('Serving fake EC2/RDS on http://127.0.0.1:%d (set SCHEDULER_ENDPOINT_URL to this)', args.port)
+    server.serve_forever()
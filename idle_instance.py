@@ -1,6 +1,9 @@
 import boto3
 from datetime import datetime
 from pytz import timezone
+from lambda_budget import has_time, order_by_cost, build_continuation, continue_later
+
+BATCH_SIZE = 50
 
 
 def ec2_change(status, ids):
@@ -12,17 +15,52 @@ def ec2_change(status, ids):
     return response
 
 
+def plan_work(status, ids):
+    ec2 = boto3.client('ec2', region_name='us-east-2')
+    response = ec2.describe_instances(InstanceIds=ids)
+    work = [{'instance_id': instance['InstanceId'], 'instance_type': instance.get('InstanceType'), 'action': status}
+            for reservation in response['Reservations'] for instance in reservation['Instances']]
+    return order_by_cost(work)
+
+
+def run_work(work, event, context):
+    failed = []
+    while work:
+        if not has_time(context):
+            # Items whose batch failed are retried by the next invocation along with the rest
+            print(f"Time budget exhausted, continuing {len(work) + len(failed)} items in a new invocation")
+            return continue_later(build_continuation(work + failed, event), context, ec2_optimize)
+        batch = work[:BATCH_SIZE]
+        for status in ("start", "stop"):
+            items = [item for item in batch if item['action'] == status]
+            if not items:
+                continue
+            try:
+                ec2_change(status, [item['instance_id'] for item in items])
+            except Exception as e:
+                print(f"Failed to {status} {len(items)} instances: {e}")
+                failed.extend(items)
+        work = work[BATCH_SIZE:]
+    if failed:
+        print(f"Could not change {len(failed)} instances: {[item['instance_id'] for item in failed]}")
+    return failed
+
+
 def ec2_optimize(event, context):
+    if event and 'continuation' in event:
+        return run_work(event['continuation']['work'], event, context)
+
     s = ["i-0ed2425feb3013168", "i-020d74232cc101f04"]
     tz = timezone('US/Eastern')
     current_t = datetime.now(tz)
     dw = current_t.isoweekday()
     print(dw)
     if dw == 1:  # Monday
-        ec2_change("start", s)
+        return run_work(plan_work("start", s), event, context)
     elif dw == 5:  # Friday
-        ec2_change("stop", s)
+        return run_work(plan_work("stop", s), event, context)
 
 
 if __name__ == "__main__":
-    ec2_optimize(None, None)
+    from lambda_budget import LocalContext
+    ec2_optimize(None, LocalContext())
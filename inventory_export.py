@@ -0,0 +1,74 @@
+import argparse
+import csv
+import gzip
+import json
+import logging
+import sys
+from aws_instance_scheduler_allv2 import get_client, get_account_id, iter_instances_with_schedule_tag, iter_rds_clusters_with_schedule_tag, iter_rds_instances_with_schedule_tag
+
+logger = logging.getLogger()
+
+# Same record layout schedule_simulator.load_inventory reads, plus the owning account
+FIELDS = ['kind', 'resource_id', 'region', 'account', 'plan', 'state']
+KINDS = ['ec2', 'rds_cluster', 'rds_instance']
+
+def iter_inventory(regions, kinds=KINDS, selector=None):
+    """
+    Yield one record per scheduled resource as discovery pages arrive; nothing is accumulated.
+    """
+    account = get_account_id(regions[0])
+    for region in regions:
+        sources = {
+            'ec2': lambda: iter_instances_with_schedule_tag(get_client('ec2', region), 'Schedule', 'On', selector=selector),
+            'rds_cluster': lambda: iter_rds_clusters_with_schedule_tag(get_client('rds', region), 'Schedule', 'On', selector=selector),
+            'rds_instance': lambda: iter_rds_instances_with_schedule_tag(get_client('rds', region), 'Schedule', 'On', selector=selector),
+        }
+        for kind in kinds:
+            for resource_id, resource_region, plan_name, state, details in sources[kind]():
+                yield {'kind': kind, 'resource_id': resource_id, 'region': resource_region, 'account': account, 'plan': plan_name, 'state': state}
+
+def open_output(path, compress=False):
+    """
+    Open a text stream for path ('-' is stdout); gzip when asked or when path ends in .gz.
+    """
+    if path == '-':
+        return gzip.open(sys.stdout.buffer, 'wt') if compress else sys.stdout
+    if compress or path.endswith('.gz'):
+        return gzip.open(path, 'wt', newline='')
+    return open(path, 'w', newline='')
+
+def write_records(records, stream, output_format='ndjson'):
+    """
+    Write records to stream one at a time as NDJSON or CSV. Returns the number written.
+    """
+    count = 0
+    if output_format == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=FIELDS)
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            count += 1
+    else:
+        for record in records:
+            stream.write(json.dumps(record) + '\n')
+            count += 1
+    return count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the scheduled resource inventory as NDJSON or CSV.")
+    parser.add_argument("--output", default="-", help="Output file; '-' writes to stdout")
+    parser.add_argument("--format", choices=["ndjson", "csv"], help="Output format; inferred from the file name when omitted")
+    parser.add_argument("--gzip", action="store_true", help="Gzip the output (implied by a .gz file name)")
+    parser.add_argument("--regions", default="us-east-1,us-west-1,us-west-2", help="Comma-separated regions to scan")
+    parser.add_argument("--kinds", default=",".join(KINDS), help="Comma-separated resource kinds to include")
+    parser.add_argument("--selector", help="Tag selector expression; defaults to SCHEDULE_SELECTOR")
+
+    args = parser.parse_args()
+    output_format = args.format or ('csv' if '.csv' in args.output else 'ndjson')
+    stream = open_output(args.output, args.gzip)
+    try:
+        count = write_records(iter_inventory(args.regions.split(','), args.kinds.split(','), args.selector), stream, output_format)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    logger.info('Exported %d resources', count)
@@ -0,0 +1,88 @@
+import json
+import os
+import re
+import time
+import boto3
+
+# Stop picking up new work once less than this much time is left in the invocation
+SAFETY_MARGIN_MS = int(os.getenv('CONTINUATION_MARGIN_MS', '10000'))
+# Upper bound on chained re-invocations for a single scheduled tick
+MAX_CONTINUATIONS = int(os.getenv('MAX_CONTINUATIONS', '10'))
+
+# Relative cost of an instance size within a family; used only for ordering work
+SIZE_WEIGHTS = {
+    'nano': 0.25,
+    'micro': 0.5,
+    'small': 1,
+    'medium': 2,
+    'large': 4,
+    'xlarge': 8,
+    'metal': 192,
+}
+
+class LocalContext:
+    """
+    Stand-in for the Lambda context object when running outside Lambda.
+    """
+    function_name = None
+
+    def __init__(self, timeout_ms=900000):
+        self.deadline = time.monotonic() + timeout_ms / 1000.0
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self.deadline - time.monotonic()) * 1000))
+
+def remaining_millis(context):
+    """
+    Return the time left in the invocation, treating a missing context as unlimited.
+    """
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return float('inf')
+    return context.get_remaining_time_in_millis()
+
+def has_time(context, margin_ms=SAFETY_MARGIN_MS):
+    """
+    Check whether there is enough time left to start another unit of work.
+    """
+    return remaining_millis(context) > margin_ms
+
+def instance_cost_weight(instance_type):
+    """
+    Approximate the relative hourly cost of an instance type from its size suffix alone.
+    The family is ignored, so an m5.large and a p3.large weigh the same; good enough for ordering.
+    """
+    if not instance_type or '.' not in instance_type:
+        return 0
+    size = instance_type.split('.', 1)[1]
+    if size in SIZE_WEIGHTS:
+        return SIZE_WEIGHTS[size]
+    match = re.fullmatch(r'(\d+)xlarge', size)
+    if match:
+        return SIZE_WEIGHTS['xlarge'] * int(match.group(1))
+    return 0
+
+def order_by_cost(work):
+    """
+    Sort work items so the (approximately) most expensive instances are handled first.
+    """
+    return sorted(work, key=lambda item: instance_cost_weight(item.get('instance_type')), reverse=True)
+
+def build_continuation(remaining_work, event=None):
+    """
+    Serialize outstanding work into the payload for the next invocation.
+    """
+    depth = (event or {}).get('continuation', {}).get('depth', 0) + 1
+    return {'continuation': {'work': remaining_work, 'depth': depth}}
+
+def continue_later(payload, context, handler):
+    """
+    Hand the remaining work to a fresh invocation, or run it inline when not in Lambda.
+    """
+    if payload['continuation']['depth'] > MAX_CONTINUATIONS:
+        raise RuntimeError(f"Giving up after {MAX_CONTINUATIONS} continuations with {len(payload['continuation']['work'])} items left")
+    function_name = getattr(context, 'function_name', None)
+    if function_name:
+        lambda_client = boto3.client('lambda')
+        lambda_client.invoke(FunctionName=function_name, InvocationType='Event', Payload=json.dumps(payload))
+        return None
+    return handler(payload, LocalContext())
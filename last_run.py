@@ -0,0 +1,24 @@
+import json
+import os
+from datetime import datetime
+
+# Where the end of the last fully processed window is kept between runs
+LAST_RUN_FILE = os.getenv('LAST_RUN_FILE', 'last_run.json')
+
+def load_last_run(path=LAST_RUN_FILE):
+    """
+    Return the timestamp the previous successful run processed up to, or None on the first run.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as file:
+        return datetime.fromisoformat(json.load(file)['processed_until'])
+
+def save_last_run(processed_until, path=LAST_RUN_FILE):
+    """
+    Record that every transition up to processed_until has been applied.
+    """
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump({'processed_until': processed_until.isoformat()}, file)
+    os.replace(tmp_path, path)
@@ -0,0 +1,77 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from resilience import start_run, remaining_seconds, RunDeadlineExceeded
+from wave_scheduler import WAVE_TAG, DEPENDS_ON_TAG
+
+logger = logging.getLogger()
+
+# SCAN_PROCESSES=N scans each region in one of N worker processes, so response parsing
+# and tag matching use every core instead of one; 0 keeps discovery in the scheduler process
+SCAN_PROCESSES = int(os.getenv('SCAN_PROCESSES', '0'))
+KINDS = ('ec2', 'rds_cluster', 'rds_instance')
+# Tags that cross the process boundary: the plan, the wave tags, and Name, which DependsOn values refer to
+KEPT_TAGS = ('Plan', 'Name', WAVE_TAG, DEPENDS_ON_TAG)
+
+def compact(kind, resource):
+    """
+    Reduce a discovery tuple to a flat record that pickles cheaply:
+    (kind, resource_id, plan_name, state, type, hibernation or arn, kept tags).
+    """
+    resource_id, region, plan_name, state, details = resource
+    extra = details.get('hibernation', False) if kind == 'ec2' else details['arn']
+    tags = tuple((key, details['tags'][key]) for key in KEPT_TAGS if key in details['tags'])
+    return (kind, resource_id, plan_name, state, details.get('type'), extra, tags)
+
+def expand(record, region):
+    """
+    Rebuild the (kind, (resource_id, region, plan_name, state, details)) pair from a compact record.
+    """
+    kind, resource_id, plan_name, state, resource_type, extra, tags = record
+    details = {'tags': dict(tags), 'type': resource_type}
+    details['hibernation' if kind == 'ec2' else 'arn'] = extra
+    return kind, (resource_id, region, plan_name, state, details)
+
+def scan_target(region, plans, applied_windows, deadline_seconds):
+    """
+    Worker entry point: discover one region and return (records, timed_out, complete).
+    """
+    # Imported here because the scheduler imports this module
+    from aws_instance_scheduler_allv2 import discover_region_resources
+    start_run(deadline_seconds)
+    found = {kind: [] for kind in KINDS}
+    timed_out = False
+    complete = False
+    try:
+        complete = discover_region_resources(region, 'Schedule', 'On', applied_windows, plans, found['ec2'], found['rds_cluster'], found['rds_instance'])
+    except RunDeadlineExceeded as e:
+        logger.error('Stopping discovery in %s: %s', region, e)
+        timed_out = True
+    return [compact(kind, resource) for kind in KINDS for resource in found[kind]], timed_out, complete
+
+def scan_in_processes(regions, plans, applied_windows, processes=SCAN_PROCESSES):
+    """
+    Scan every region in a pool of worker processes. Returns ({kind: [resource tuples]}, complete), the
+    first in the same shape as in-process discovery; a failed region is logged, left out and makes complete False.
+    """
+    found = {kind: [] for kind in KINDS}
+    complete = True
+    # Spawned rather than forked: the run lock's heartbeat thread is alive in the parent
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(processes, len(regions)), mp_context=context) as pool:
+        futures = {pool.submit(scan_target, region, plans, applied_windows, remaining_seconds()): region for region in regions}
+        for future in as_completed(futures):
+            region = futures[future]
+            try:
+                records, timed_out, target_complete = future.result()
+            except Exception as e:
+                logger.error('Error scanning %s: %s', region, e)
+                complete = False
+                continue
+            complete = complete and target_complete
+            for record in records:
+                kind, resource = expand(record, region)
+                found[kind].append(resource)
+            logger.info('Scanned %s: %d resources%s', region, len(records), ' (stopped at the run deadline)' if timed_out else '')
+    return found, complete
@@ -0,0 +1,113 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger()
+
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '1000'))
+PIPELINE_BATCH_SIZE = int(os.getenv('PIPELINE_BATCH_SIZE', '50'))
+PIPELINE_FLUSH_SECONDS = float(os.getenv('PIPELINE_FLUSH_SECONDS', '1.0'))
+PIPELINE_DISPATCH_WORKERS = int(os.getenv('PIPELINE_DISPATCH_WORKERS', '4'))
+
+_DONE = object()
+
+def _discover(source, out_queue, errors):
+    try:
+        for item in source():
+            out_queue.put(item)
+    except Exception as e:
+        logger.error('Discovery source %s failed: %s', getattr(source, '__name__', source), e)
+        errors.append(e)
+    finally:
+        out_queue.put(_DONE)
+
+def _decide(in_queue, out_queue, decide, producers, errors):
+    # A failing item is reported and skipped; the stage keeps draining so producers never block
+    remaining = producers
+    try:
+        while remaining:
+            item = in_queue.get()
+            if item is _DONE:
+                remaining -= 1
+                continue
+            try:
+                entry = decide(item)
+            except Exception as e:
+                logger.error('Deciding on %s failed: %s', item, e)
+                errors.append(e)
+                continue
+            if entry is not None:
+                out_queue.put(entry)
+    finally:
+        out_queue.put(_DONE)
+
+def _batch(in_queue, out_queue, batch_key, batch_size, flush_seconds, workers, errors):
+    pending = {}
+    started = {}
+    try:
+        while True:
+            try:
+                entry = in_queue.get(timeout=flush_seconds)
+            except queue.Empty:
+                entry = None
+            if entry is _DONE:
+                break
+            now = time.monotonic()
+            if entry is not None:
+                try:
+                    key = batch_key(entry)
+                except Exception as e:
+                    logger.error('Batching %s failed: %s', entry, e)
+                    errors.append(e)
+                    continue
+                pending.setdefault(key, []).append(entry)
+                started.setdefault(key, now)
+                if len(pending[key]) >= batch_size:
+                    out_queue.put(pending.pop(key))
+                    started.pop(key)
+            # Flush partial batches that have waited long enough so slow regions never hold back fast ones
+            for key in [key for key, since in started.items() if now - since >= flush_seconds]:
+                out_queue.put(pending.pop(key))
+                started.pop(key)
+        for batch in pending.values():
+            out_queue.put(batch)
+    finally:
+        for _ in range(workers):
+            out_queue.put(_DONE)
+
+def _dispatch(in_queue, dispatch, results):
+    while True:
+        batch = in_queue.get()
+        if batch is _DONE:
+            return
+        try:
+            results.extend(dispatch(batch) or [])
+        except Exception as e:
+            logger.error('Dispatch of %d actions failed: %s', len(batch), e)
+
+def run_pipeline(sources, decide, batch_key, dispatch,
+                 queue_size=PIPELINE_QUEUE_SIZE, batch_size=PIPELINE_BATCH_SIZE,
+                 flush_seconds=PIPELINE_FLUSH_SECONDS, workers=PIPELINE_DISPATCH_WORKERS):
+    """
+    Stream resources through discover -> decide -> batch -> dispatch stages connected by bounded queues.
+    sources are callables returning iterators of resources, decide maps a resource to an action entry
+    or None, batch_key groups entries that can share a dispatch, and dispatch receives a list of entries
+    and returns the ones that succeeded. Returns (succeeded entries, discovery, decide and batching errors).
+    """
+    discovered = queue.Queue(maxsize=queue_size)
+    decided = queue.Queue(maxsize=queue_size)
+    batches = queue.Queue(maxsize=max(1, queue_size // batch_size))
+    errors = []
+    results = []
+
+    threads = [threading.Thread(target=_discover, args=(source, discovered, errors), daemon=True) for source in sources]
+    threads.append(threading.Thread(target=_decide, args=(discovered, decided, decide, len(sources), errors), daemon=True))
+    threads.append(threading.Thread(target=_batch, args=(decided, batches, batch_key, batch_size, flush_seconds, workers, errors), daemon=True))
+    threads.extend(threading.Thread(target=_dispatch, args=(batches, dispatch, results), daemon=True) for _ in range(workers))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
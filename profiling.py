@@ -0,0 +1,99 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from tracing import span
+
+logger = logging.getLogger()
+
+# SCHEDULER_PROFILE=1 profiles Lambda runs the way --profile does on the command line
+SCHEDULER_PROFILE = os.getenv('SCHEDULER_PROFILE') == '1'
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_TOP = int(os.getenv('PROFILE_TOP', '20'))
+
+_stages = {}
+_stages_lock = threading.Lock()
+_active = False
+
+@contextmanager
+def stage(name):
+    """
+    Time a named stage of a run, accumulating wall and CPU seconds while a profile is running,
+    and record it as a span while a trace is running.
+    CPU time is process-wide, so a stage that mostly waits on the network shows wall well above CPU.
+    """
+    if not _active:
+        with span(name):
+            yield
+        return
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        with span(name):
+            yield
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        with _stages_lock:
+            calls, total_wall, total_cpu = _stages.get(name, (0, 0.0, 0.0))
+            _stages[name] = (calls + 1, total_wall + wall, total_cpu + cpu)
+
+def stage_summary():
+    """
+    Format the per-stage table: calls, wall seconds, CPU seconds and CPU share of wall.
+    """
+    lines = [f"{'stage':<24}{'calls':>7}{'wall s':>10}{'cpu s':>10}{'cpu/wall':>10}"]
+    for name, (calls, wall, cpu) in sorted(_stages.items(), key=lambda item: -item[1][1]):
+        lines.append(f'{name:<24}{calls:>7}{wall:>10.3f}{cpu:>10.3f}{(cpu / wall if wall else 0):>10.0%}')
+    return '\n'.join(lines)
+
+def allocation_summary(snapshot, top=PROFILE_TOP):
+    """
+    Format the source lines that allocated the most memory still held at the end of the run.
+    """
+    stats = snapshot.statistics('lineno')
+    return '\n'.join(str(stat) for stat in stats[:top])
+
+def profile_run(func, *args, label='scheduler', directory=PROFILE_DIR, top=PROFILE_TOP, **kwargs):
+    """
+    Run func under cProfile and tracemalloc. Writes <label>-<timestamp>.prof (load with pstats or
+    snakeviz) and a .txt summary of stages, hottest functions and top allocators next to it.
+    """
+    global _active
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, f"{label}-{datetime.now().strftime('%Y%m%dT%H%M%S')}")
+    with _stages_lock:
+        _stages.clear()
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    _active = True
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        profiler.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+    finally:
+        _active = False
+        with _stages_lock:
+            _stages['total'] = (1, time.perf_counter() - wall_start, time.process_time() - cpu_start)
+        snapshot = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        profiler.dump_stats(f'{base}.prof')
+        functions = io.StringIO()
+        pstats.Stats(profiler, stream=functions).sort_stats('cumulative').print_stats(top)
+        summary = (f'Stages\n{stage_summary()}\n\nPeak traced memory: {peak / 1024 / 1024:.1f} MiB\n\n'
+                   f'Top allocators\n{allocation_summary(snapshot, top)}\n\nHottest functions (main thread)\n{functions.getvalue()}')
+        with open(f'{base}.txt', 'w') as file:
+            file.write(summary)
+        logger.info('Profile written to %s.prof and %s.txt\n%s', base, base, stage_summary())
@@ -0,0 +1,140 @@
+import logging
+import os
+import threading
+import time
+from botocore.config import Config
+
+logger = logging.getLogger()
+
+AWS_CONNECT_TIMEOUT = float(os.getenv('AWS_CONNECT_TIMEOUT', '5'))
+AWS_READ_TIMEOUT = float(os.getenv('AWS_READ_TIMEOUT', '20'))
+AWS_MAX_ATTEMPTS = int(os.getenv('AWS_MAX_ATTEMPTS', '3'))
+AWS_RETRY_MODE = os.getenv('AWS_RETRY_MODE', 'standard')
+# Wall-clock budget for one scheduler run; 0 disables the deadline
+RUN_DEADLINE_SECONDS = float(os.getenv('RUN_DEADLINE_SECONDS', '600'))
+# Consecutive failures after which a (region, service) is skipped until its cool-down passes
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '3'))
+# Seconds an open circuit waits before letting a single trial call through
+CIRCUIT_COOLDOWN_SECONDS = float(os.getenv('CIRCUIT_COOLDOWN_SECONDS', '60'))
+# Error codes that say the endpoint is unhealthy, as opposed to a problem with one request
+UNHEALTHY_CODES = ('RequestLimitExceeded', 'Throttling', 'ThrottlingException', 'ThrottledException',
+                   'ServiceUnavailable', 'Unavailable', 'InternalError', 'InternalFailure', 'RequestTimeout')
+
+class RunDeadlineExceeded(Exception):
+    pass
+
+class CircuitOpenError(Exception):
+    pass
+
+class CircuitBreaker:
+    """
+    Count consecutive unhealthy responses per (region, service). Once the threshold is reached the
+    circuit opens; after cooldown_seconds one trial call is let through (half-open), which closes
+    the circuit on success and reopens it on failure.
+    """
+    def __init__(self, threshold=CIRCUIT_FAILURE_THRESHOLD, cooldown_seconds=CIRCUIT_COOLDOWN_SECONDS):
+        self.threshold = threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.failures = {}
+        self.opened = {}
+        self.trials = set()
+        self.lock = threading.Lock()
+
+    def is_open(self, key):
+        with self.lock:
+            if key not in self.opened:
+                return False
+            if key not in self.trials and time.monotonic() - self.opened[key] >= self.cooldown_seconds:
+                self.trials.add(key)
+                logger.info('Circuit half-open for %s %s; letting one call through', key[1], key[0])
+                return False
+            return True
+
+    def record_success(self, key):
+        with self.lock:
+            self.failures[key] = 0
+            if self.opened.pop(key, None) is not None:
+                self.trials.discard(key)
+                logger.info('Circuit closed for %s %s', key[1], key[0])
+
+    def record_failure(self, key, reason):
+        with self.lock:
+            self.failures[key] = self.failures.get(key, 0) + 1
+            if key in self.trials:
+                self.trials.discard(key)
+                self.opened[key] = time.monotonic()
+                logger.error('Circuit reopened for %s %s after a failed trial call (%s)', key[1], key[0], reason)
+            elif self.failures[key] >= self.threshold and key not in self.opened:
+                self.opened[key] = time.monotonic()
+                logger.error('Circuit open for %s %s after %d consecutive failures (last: %s); skipping it for %.0f s',
+                             key[1], key[0], self.failures[key], reason, self.cooldown_seconds)
+
+    def reset(self):
+        with self.lock:
+            self.failures.clear()
+            self.opened.clear()
+            self.trials.clear()
+
+BREAKER = CircuitBreaker()
+_deadline = None
+
+def start_run(seconds=RUN_DEADLINE_SECONDS):
+    """
+    Start the run deadline and close every circuit. Called once at the start of a scheduler run.
+    """
+    global _deadline
+    _deadline = time.monotonic() + seconds if seconds else None
+    BREAKER.reset()
+
+def remaining_seconds():
+    """
+    Seconds left before the run deadline, or None when no deadline is set.
+    """
+    return None if _deadline is None else _deadline - time.monotonic()
+
+def deadline_passed():
+    return _deadline is not None and time.monotonic() >= _deadline
+
+def client_config():
+    """
+    botocore Config with the configured timeouts and retries; the read timeout never outlasts the run.
+    """
+    read_timeout = AWS_READ_TIMEOUT
+    remaining = remaining_seconds()
+    if remaining is not None:
+        read_timeout = max(1.0, min(read_timeout, remaining))
+    return Config(connect_timeout=AWS_CONNECT_TIMEOUT, read_timeout=read_timeout,
+                  retries={'max_attempts': AWS_MAX_ATTEMPTS, 'mode': AWS_RETRY_MODE})
+
+def attach_resilience(client, breaker=BREAKER):
+    """
+    Register hooks that refuse calls past the run deadline or to an open circuit, and feed
+    call outcomes into the breaker for the client's (region, service).
+    """
+    key = (client.meta.region_name, client.meta.service_model.service_name)
+
+    def before_call(model, **kwargs):
+        if breaker.is_open(key):
+            raise CircuitOpenError(f'Circuit open for {key[1]} in {key[0]}; skipping {model.name}')
+
+    def before_send(request, **kwargs):
+        # Runs before every attempt, so retries stop at the deadline too
+        remaining = remaining_seconds()
+        if remaining is not None and remaining <= 0:
+            raise RunDeadlineExceeded(f'Run deadline passed before {key[1]} call in {key[0]}')
+
+    def after_call(http_response, parsed, model, **kwargs):
+        code = parsed.get('Error', {}).get('Code', '')
+        if http_response.status_code >= 500 or code in UNHEALTHY_CODES:
+            breaker.record_failure(key, code or http_response.status_code)
+        else:
+            breaker.record_success(key)
+
+    def after_call_error(exception, **kwargs):
+        breaker.record_failure(key, exception)
+
+    client.meta.events.register('before-call', before_call)
+    client.meta.events.register('before-send', before_send)
+    client.meta.events.register('after-call', after_call)
+    client.meta.events.register('after-call-error', after_call_error)
+    return client
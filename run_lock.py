@@ -0,0 +1,244 @@
+import fcntl
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+logger = logging.getLogger()
+
+# RUN_LOCK_BACKEND is one of: file, dynamodb, sqlite (local stand-in for the table), none
+RUN_LOCK_BACKEND = os.getenv('RUN_LOCK_BACKEND', 'file')
+RUN_LOCK_NAME = os.getenv('RUN_LOCK_NAME', 'instance-scheduler')
+RUN_LOCK_FILE = os.getenv('RUN_LOCK_FILE', 'scheduler.lock')
+RUN_LOCK_TABLE = os.getenv('RUN_LOCK_TABLE', 'scheduler-locks')
+RUN_LOCK_SQLITE = os.getenv('RUN_LOCK_SQLITE', 'scheduler_locks.db')
+RUN_LOCK_LEASE_SECONDS = int(os.getenv('RUN_LOCK_LEASE_SECONDS', '120'))
+# 0 skips a tick that finds the lock held; a positive value queues behind it for that long
+RUN_LOCK_WAIT_SECONDS = int(os.getenv('RUN_LOCK_WAIT_SECONDS', '0'))
+RUN_LOCK_POLL_SECONDS = 5
+
+class FileLockBackend:
+    """
+    Lease record in a local file, read and written under an exclusive flock.
+    """
+    def __init__(self, path=RUN_LOCK_FILE):
+        self.path = path
+
+    @contextmanager
+    def _locked(self):
+        with open(self.path, 'a+') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                file.seek(0)
+                content = file.read()
+                yield file, json.loads(content) if content else {}
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def _write(self, file, record):
+        file.seek(0)
+        file.truncate()
+        json.dump(record, file)
+        file.flush()
+
+    def acquire(self, name, owner, lease_seconds):
+        with self._locked() as (file, records):
+            now = time.time()
+            current = records.get(name)
+            if current and current['owner'] != owner and current['expires'] > now:
+                return False
+            records[name] = {'owner': owner, 'expires': now + lease_seconds}
+            self._write(file, records)
+            return True
+
+    def renew(self, name, owner, lease_seconds):
+        with self._locked() as (file, records):
+            current = records.get(name)
+            if not current or current['owner'] != owner:
+                return False
+            current['expires'] = time.time() + lease_seconds
+            self._write(file, records)
+            return True
+
+    def release(self, name, owner):
+        with self._locked() as (file, records):
+            if records.get(name, {}).get('owner') == owner:
+                del records[name]
+                self._write(file, records)
+
+class DynamoDbBackend:
+    """
+    Lease item in a DynamoDB table keyed by LockName, written with conditional expressions.
+    """
+    def __init__(self, table_name=RUN_LOCK_TABLE, client=None):
+        if client is None:
+            import boto3
+            client = boto3.client('dynamodb')
+        self.client = client
+        self.table_name = table_name
+
+    def _conditional(self, call, **kwargs):
+        try:
+            call(TableName=self.table_name, **kwargs)
+            return True
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return False
+
+    def acquire(self, name, owner, lease_seconds):
+        now = time.time()
+        return self._conditional(
+            self.client.put_item,
+            Item={'LockName': {'S': name}, 'Owner': {'S': owner}, 'Expires': {'N': str(now + lease_seconds)}},
+            ConditionExpression='attribute_not_exists(LockName) OR #expires < :now OR #owner = :owner',
+            ExpressionAttributeNames={'#owner': 'Owner', '#expires': 'Expires'},
+            ExpressionAttributeValues={':now': {'N': str(now)}, ':owner': {'S': owner}},
+        )
+
+    def renew(self, name, owner, lease_seconds):
+        return self._conditional(
+            self.client.update_item,
+            Key={'LockName': {'S': name}},
+            UpdateExpression='SET #expires = :expires',
+            ConditionExpression='#owner = :owner',
+            ExpressionAttributeNames={'#owner': 'Owner', '#expires': 'Expires'},
+            ExpressionAttributeValues={':expires': {'N': str(time.time() + lease_seconds)}, ':owner': {'S': owner}},
+        )
+
+    def release(self, name, owner):
+        self._conditional(
+            self.client.delete_item,
+            Key={'LockName': {'S': name}},
+            ConditionExpression='#owner = :owner',
+            ExpressionAttributeNames={'#owner': 'Owner'},
+            ExpressionAttributeValues={':owner': {'S': owner}},
+        )
+
+class LocalTableStandIn:
+    """
+    SQLite table with the same conditional-write semantics as DynamoDbBackend, for local runs and tests.
+    """
+    def __init__(self, path=RUN_LOCK_SQLITE):
+        self.path = path
+        with self._connect() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS locks (name TEXT PRIMARY KEY, owner TEXT, expires REAL)')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level='IMMEDIATE')
+
+    def acquire(self, name, owner, lease_seconds):
+        now = time.time()
+        with self._connect() as connection:
+            cursor = connection.execute(
+                'INSERT INTO locks (name, owner, expires) VALUES (?, ?, ?) '
+                'ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires '
+                'WHERE locks.expires < ? OR locks.owner = excluded.owner',
+                (name, owner, now + lease_seconds, now),
+            )
+            return cursor.rowcount == 1
+
+    def renew(self, name, owner, lease_seconds):
+        with self._connect() as connection:
+            cursor = connection.execute('UPDATE locks SET expires = ? WHERE name = ? AND owner = ?', (time.time() + lease_seconds, name, owner))
+            return cursor.rowcount == 1
+
+    def release(self, name, owner):
+        with self._connect() as connection:
+            connection.execute('DELETE FROM locks WHERE name = ? AND owner = ?', (name, owner))
+
+def get_backend(kind=RUN_LOCK_BACKEND):
+    """
+    Build the configured lock backend, or None when locking is disabled.
+    """
+    if kind == 'none':
+        return None
+    if kind == 'file':
+        return FileLockBackend()
+    if kind == 'dynamodb':
+        return DynamoDbBackend()
+    if kind == 'sqlite':
+        return LocalTableStandIn()
+    raise ValueError(f'Unknown RUN_LOCK_BACKEND: {kind}')
+
+class RunLock:
+    """
+    Lease-based lock renewed by a heartbeat thread while held.
+    lost is set if a renewal fails, meaning another run may have taken over.
+    """
+    def __init__(self, backend, name=RUN_LOCK_NAME, lease_seconds=RUN_LOCK_LEASE_SECONDS):
+        self.backend = backend
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def acquire(self, wait_seconds=RUN_LOCK_WAIT_SECONDS):
+        deadline = time.monotonic() + wait_seconds
+        while not self.backend.acquire(self.name, self.owner, self.lease_seconds):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(RUN_LOCK_POLL_SECONDS)
+        self._heartbeat = threading.Thread(target=self._renew_until_released, daemon=True)
+        self._heartbeat.start()
+        return True
+
+    def _renew_until_released(self):
+        expires = time.monotonic() + self.lease_seconds
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                renewed = self.backend.renew(self.name, self.owner, self.lease_seconds)
+            except Exception as e:
+                logger.error('Error renewing run lock %s: %s', self.name, e)
+                # Once the lease runs out unrenewed another run may acquire it
+                if time.monotonic() >= expires:
+                    self.lost.set()
+                    return
+                continue
+            if renewed:
+                expires = time.monotonic() + self.lease_seconds
+            if not renewed:
+                logger.error('Run lock %s was lost to another run', self.name)
+                self.lost.set()
+                return
+
+    def release(self):
+        self._stop.set()
+        if self._heartbeat:
+            self._heartbeat.join()
+        self.backend.release(self.name, self.owner)
+
+_held = None
+
+def run_lock_lost():
+    """
+    True when the run lock this process holds has been lost; dispatching must stop.
+    """
+    return _held is not None and _held.lost.is_set()
+
+@contextmanager
+def hold_run_lock(backend=None, wait_seconds=RUN_LOCK_WAIT_SECONDS):
+    """
+    Yield True while holding the run lock, or False if another run holds it past wait_seconds.
+    Always yields True when RUN_LOCK_BACKEND=none.
+    """
+    backend = backend or get_backend()
+    if backend is None:
+        yield True
+        return
+    global _held
+    lock = RunLock(backend)
+    if not lock.acquire(wait_seconds):
+        yield False
+        return
+    _held = lock
+    try:
+        yield True
+    finally:
+        _held = None
+        lock.release()
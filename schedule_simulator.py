@@ -0,0 +1,165 @@
+import argparse
+import csv
+import gzip
+import json
+import logging
+from datetime import datetime, timedelta
+import numpy as np
+from pytz import timezone, utc
+from state_tags import RUNNING_STATES
+from transition_index import build_transition_index
+
+logger = logging.getLogger()
+
+KINDS = ('ec2', 'rds_cluster', 'rds_instance')
+
+def load_inventory(file_path):
+    """
+    Load recorded resources from an NDJSON file or a JSON list of records, optionally gzipped.
+    Each record needs kind, resource_id, region, plan and state.
+    """
+    with (gzip.open if file_path.endswith('.gz') else open)(file_path, 'rt') as file:
+        text = file.read()
+    if text.lstrip().startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+def local_calendar(minutes, tz_name):
+    """
+    Convert UTC epoch minutes to local ISO weekday and minute-of-day arrays for a timezone.
+    """
+    tz = timezone(tz_name)
+    # Offsets only change on DST boundaries, so sample them hourly and broadcast
+    hours = np.unique(minutes // 60)
+    offsets = np.array([
+        datetime.fromtimestamp(int(hour) * 3600, utc).astimezone(tz).utcoffset().total_seconds() // 60
+        for hour in hours
+    ], dtype=np.int64)
+    local = minutes + offsets[np.searchsorted(hours, minutes // 60)]
+    weekday = (local // 1440 + 3) % 7 + 1
+    return weekday, local % 1440
+
+def desired_actions(schedule_data, plan_names, minutes, resolution=1):
+    """
+    Place every plan's start and stop transitions on the time axis, from the same transition index
+    the scheduler uses. Returns a (plan x time) int8 array: 1 for start, -1 for stop, 0 for no
+    transition. A step covers the resolution minutes up to it and keeps the last transition among them.
+    """
+    index = build_transition_index({plan_name: schedule_data[plan_name] for plan_name in plan_names if plan_name in schedule_data})
+    # Every minute the steps cover, one row per step
+    covered = (minutes[:, None] - np.arange(resolution - 1, -1, -1)).ravel()
+    desired = np.zeros((len(plan_names), len(covered)), dtype=np.int8)
+    for tz_name, table in index.items():
+        weekday, minute_of_day = local_calendar(covered, tz_name)
+        minute_of_week = (weekday - 1) * 1440 + minute_of_day
+        for p, plan_name in enumerate(plan_names):
+            week = np.zeros(10080, dtype=np.int8)
+            for minute, actions in table.items():
+                if plan_name in actions:
+                    week[minute] = 1 if actions[plan_name] == 'start' else -1
+            if week.any():
+                desired[p] = week[minute_of_week]
+    desired = desired.reshape(len(plan_names), len(minutes), resolution)
+    # Keep the last transition inside each step
+    last = resolution - 1 - np.argmax(desired[:, :, ::-1] != 0, axis=2)
+    return np.take_along_axis(desired, last[:, :, None], axis=2)[:, :, 0]
+
+def simulate(inventory, schedule_data, start, days=7, resolution=1, ec2_batch_size=1):
+    """
+    Simulate the fleet over the horizon and return per-step running counts, starts, stops and API calls.
+    """
+    start_minute = int(start.timestamp() // 60)
+    minutes = np.arange(start_minute, start_minute + days * 1440, resolution, dtype=np.int64)
+
+    plan_names = sorted({record['plan'] for record in inventory})
+    regions = sorted({record['region'] for record in inventory})
+    plan_idx = np.array([plan_names.index(record['plan']) for record in inventory], dtype=np.int64)
+    region_idx = np.array([regions.index(record['region']) for record in inventory], dtype=np.int64)
+    kind_idx = np.array([KINDS.index(record['kind']) for record in inventory], dtype=np.int64)
+    initial = np.array([record.get('state') in RUNNING_STATES for record in inventory], dtype=np.int64)
+
+    # Resources sharing plan, initial state, region and kind behave identically; simulate each group once
+    keys = ((plan_idx * 2 + initial) * len(regions) + region_idx) * len(KINDS) + kind_idx
+    group_keys, counts = np.unique(keys, return_counts=True)
+    g_kind = group_keys % len(KINDS)
+    g_region = (group_keys // len(KINDS)) % len(regions)
+    g_initial = (group_keys // (len(KINDS) * len(regions))) % 2
+    g_plan = group_keys // (len(KINDS) * len(regions) * 2)
+
+    desired = desired_actions(schedule_data, plan_names, minutes, resolution)
+    # Forward-fill the last non-zero action so "no action" keeps the previous state
+    last = np.where(desired != 0, np.arange(len(minutes)), -1)
+    last = np.maximum.accumulate(last, axis=1)
+    filled = np.take_along_axis(desired, np.clip(last, 0, None), axis=1)
+    running = np.where(last[g_plan] >= 0, filled[g_plan] == 1, g_initial[:, None].astype(bool))
+
+    previous = np.concatenate([g_initial[:, None].astype(bool), running[:, :-1]], axis=1)
+    started = running & ~previous
+    stopped = ~running & previous
+
+    running_curve = counts @ running
+    starts = counts @ started
+    stops = counts @ stopped
+
+    # EC2 calls are batched per region and action; RDS calls are one per resource
+    bucket = g_region * len(KINDS) + g_kind
+    per_bucket_starts = np.zeros((len(regions) * len(KINDS), len(minutes)), dtype=np.int64)
+    per_bucket_stops = np.zeros_like(per_bucket_starts)
+    np.add.at(per_bucket_starts, bucket, started * counts[:, None])
+    np.add.at(per_bucket_stops, bucket, stopped * counts[:, None])
+    batch = np.array([ec2_batch_size if KINDS[b % len(KINDS)] == 'ec2' else 1 for b in range(len(regions) * len(KINDS))])[:, None]
+    api_calls = (-(-per_bucket_starts // batch) - (-per_bucket_stops // batch)).sum(axis=0)
+
+    return {
+        'minutes': minutes,
+        'running': running_curve,
+        'starts': starts,
+        'stops': stops,
+        'api_calls': api_calls,
+    }
+
+def write_csv(result, file_path):
+    """
+    Write the simulated curves as one CSV row per time step.
+    """
+    with open(file_path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['timestamp', 'running', 'starts', 'stops', 'api_calls'])
+        for i, minute in enumerate(result['minutes']):
+            writer.writerow([
+                datetime.fromtimestamp(int(minute) * 60, utc).strftime('%Y-%m-%dT%H:%MZ'),
+                int(result['running'][i]),
+                int(result['starts'][i]),
+                int(result['stops'][i]),
+                int(result['api_calls'][i]),
+            ])
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    parser = argparse.ArgumentParser(description="Simulate a schedule against a recorded inventory.")
+    parser.add_argument("--inventory", required=True, help="NDJSON or JSON inventory file")
+    parser.add_argument("--schedule", default="schedule.json", help="Schedule file to evaluate")
+    parser.add_argument("--start", help="Simulation start in ISO format (UTC); defaults to the current minute")
+    parser.add_argument("--days", type=int, default=7, help="Length of the simulated horizon in days")
+    parser.add_argument("--resolution", type=int, default=1, help="Step size in minutes")
+    parser.add_argument("--ec2-batch-size", type=int, default=1, help="EC2 instances per start/stop call")
+    parser.add_argument("--output", default="simulation.csv", help="CSV file for the per-step results")
+
+    args = parser.parse_args()
+    if args.start:
+        start = utc.localize(datetime.fromisoformat(args.start))
+    else:
+        start = datetime.now(utc).replace(second=0, microsecond=0)
+
+    with open(args.schedule, 'r') as file:
+        schedule_data = json.load(file)
+    inventory = load_inventory(args.inventory)
+
+    result = simulate(inventory, schedule_data, start, args.days, args.resolution, args.ec2_batch_size)
+    write_csv(result, args.output)
+
+    step_hours = args.resolution / 60
+    logger.info(f"Simulated {len(inventory)} resources over {args.days} days")
+    logger.info(f"Peak running: {int(result['running'].max())}, instance-hours: {result['running'].sum() * step_hours:.1f}")
+    logger.info(f"Starts: {int(result['starts'].sum())}, stops: {int(result['stops'].sum())}, API calls: {int(result['api_calls'].sum())}")
+    logger.info(f"Busiest step: {int(result['api_calls'].max())} API calls")
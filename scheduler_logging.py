@@ -0,0 +1,62 @@
+import atexit
+import logging
+import os
+import queue
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener
+
+# 'summary' logs counts plus a small sample per list; 'full' logs every resource
+LOG_MODE = os.getenv('LOG_MODE', 'summary')
+LOG_SAMPLE_SIZE = int(os.getenv('LOG_SAMPLE_SIZE', '5'))
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Queue records without formatting them. The stock prepare() renders the message on the calling
+    thread so records can be pickled; this queue never leaves the process, so rendering is left to
+    the listener. Arguments are read when the listener formats the record, so log snapshots of
+    anything that keeps changing.
+    """
+    def prepare(self, record):
+        return record
+
+def setup_logging(level=logging.INFO, fmt='%(levelname)s: %(message)s'):
+    """
+    Route all records through a queue so formatting and I/O happen on a background thread.
+    """
+    root = logging.getLogger()
+    if any(isinstance(handler, QueueHandler) for handler in root.handlers):
+        return root
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(fmt))
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    root.setLevel(level)
+    listener.start()
+    atexit.register(listener.stop)
+    return root
+
+def summarize_resources(resources):
+    """
+    Count (resource_id, region[, plan_name[, state[, details]]]) tuples per region and per plan.
+    Tuples without a plan are counted under None, so both counts add up to the total.
+    """
+    by_region = Counter(resource[1] for resource in resources)
+    by_plan = Counter(resource[2] if len(resource) > 2 else None for resource in resources)
+    return by_region, by_plan
+
+def log_resources(logger, label, resources, mode=None):
+    """
+    Log a resource list as summary counts and a bounded sample, or in full when LOG_MODE=full.
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    # Resource details are updated after discovery, so they are rendered now rather than on the listener
+    if (mode or LOG_MODE) == 'full':
+        logger.info('%s: %s', label, repr(list(resources)))
+        return
+    by_region, by_plan = summarize_resources(resources)
+    logger.info('%s: %d total, by region %s, by plan %s, sample %s',
+                label, len(resources), dict(by_region), dict(by_plan), repr(resources[:LOG_SAMPLE_SIZE]))
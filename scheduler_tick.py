@@ -0,0 +1,95 @@
+import json
+import os
+
+# In Lambda only /tmp is writable. State files default there, before the modules below read their
+# paths. /tmp lasts only as long as the execution environment, and a file lock only guards one
+# environment, so a Lambda deployment should set RUN_LOCK_BACKEND=dynamodb (with RUN_LOCK_TABLE).
+# A cold start then begins with no last_run and checks only the current minute.
+LAMBDA_STATE_PATHS = {
+    'RUN_LOCK_FILE': 'scheduler.lock',
+    'RUN_LOCK_SQLITE': 'scheduler_locks.db',
+    'LAST_RUN_FILE': 'last_run.json',
+    'ACTION_JOURNAL': 'action_journal.ndjson',
+    'BOOT_LATENCY_FILE': 'boot_latency.json',
+    'ACTION_HISTORY_DIR': 'action_history',
+    'PROFILE_DIR': 'profiles',
+    'TRACE_DIR': 'traces',
+}
+if os.getenv('AWS_LAMBDA_FUNCTION_NAME'):
+    for name, file_name in LAMBDA_STATE_PATHS.items():
+        os.environ.setdefault(name, os.path.join('/tmp', file_name))
+
+from datetime import datetime, timezone
+from transition_index import build_transition_index, transitions_since, upcoming_starts
+from last_run import load_last_run
+from run_lock import hold_run_lock
+from profiling import SCHEDULER_PROFILE
+from tracing import trace_run, SCHEDULER_TRACE
+from boot_latency import load_store, max_lead_seconds, PRESTART_ENABLED, PRESTART_HORIZON_MINUTES
+
+# Entry point for the every-minute trigger. Decides from schedule.json alone whether any
+# plan transitioned since the last completed run, and only then imports boto3 and the scheduler.
+
+SCHEDULE_FILE = os.getenv('SCHEDULE_FILE', 'schedule.json')
+
+def due_now(schedule_file=SCHEDULE_FILE, now=None):
+    """
+    Return {plan_name: action} for plans with a transition since the last completed run, without any AWS calls.
+    """
+    with open(schedule_file, 'r') as file:
+        schedule = json.load(file)
+    transitions = transitions_since(build_transition_index(schedule), load_last_run(), now or datetime.now(timezone.utc))
+    return {plan_name: action for plan_name, (action, when) in transitions.items()}
+
+def boot_work_now(schedule_file=SCHEDULE_FILE, now=None):
+    """
+    Report whether an earlier start is still being timed or, with PRESTART=1, a start must be issued early.
+    Pending starts are polled on every tick even with PRESTART off; otherwise readiness would only be seen
+    at the next transition and the learned latencies would include the wait.
+    """
+    store = load_store()
+    if store['pending']:
+        return True
+    if not PRESTART_ENABLED:
+        return False
+    with open(schedule_file, 'r') as file:
+        schedule = json.load(file)
+    upcoming = upcoming_starts(build_transition_index(schedule), now or datetime.now(timezone.utc), PRESTART_HORIZON_MINUTES)
+    max_lead = max_lead_seconds(store)
+    return any(minutes * 60 <= max_lead for minutes in upcoming.values())
+
+def run_tick():
+    """
+    Exit immediately when nothing is due; otherwise run a full scheduler pass.
+    """
+    now = datetime.now(timezone.utc)
+    due = due_now(now=now)
+    if not due and not boot_work_now(now=now):
+        # last_run is left alone: it is only written under the run lock, and the window check stays cheap as it grows
+        print('No plan transitions due; skipping scan.')
+        return False
+    # A previous tick still running holds the lock; skip (or queue, with RUN_LOCK_WAIT_SECONDS) instead of piling on
+    with hold_run_lock() as acquired:
+        if not acquired:
+            print('Another scheduler run holds the run lock; skipping this tick.')
+            return False
+        import aws_instance_scheduler_allv2 as scheduler
+        run = scheduler.manage_instances_pipelined if due and os.getenv('PIPELINE') == '1' else scheduler.manage_instances
+        if SCHEDULER_TRACE:
+            trace_run(run, label='tick')
+        else:
+            run()
+    return True
+
+def lambda_handler(event, context):
+    if SCHEDULER_PROFILE:
+        from profiling import profile_run
+        return {'ran': profile_run(run_tick, label='tick')}
+    return {'ran': run_tick()}
+
+if __name__ == "__main__":
+    if SCHEDULER_PROFILE:
+        from profiling import profile_run
+        profile_run(run_tick, label='tick')
+    else:
+        run_tick()
@@ -0,0 +1,68 @@
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pytz import timezone
+
+logger = logging.getLogger()
+
+LAST_ACTION_TAG = 'SchedulerLastAction'
+LAST_ACTION_TIME_TAG = 'SchedulerLastActionTime'
+WINDOW_TAG = 'SchedulerWindow'
+PLAN_VERSION_TAG = 'SchedulerPlanVersion'
+
+# States counted as up (and billing) across EC2 instances, RDS instances and RDS clusters
+RUNNING_STATES = ('running', 'available', 'pending', 'starting')
+
+# EC2 CreateTags accepts many resource IDs per call; keep requests to a sane size
+EC2_TAG_BATCH_SIZE = 1000
+RDS_TAG_WORKERS = int(os.getenv('RDS_TAG_WORKERS', '8'))
+
+def plan_version(plan_schedule):
+    """
+    Return a short, stable fingerprint of a plan's configuration.
+    """
+    return hashlib.sha1(json.dumps(plan_schedule, sort_keys=True).encode()).hexdigest()[:8]
+
+def build_state_tags(action, window, version):
+    """
+    Build the tag list recording what the scheduler last did to a resource.
+    """
+    return [
+        {'Key': LAST_ACTION_TAG, 'Value': action},
+        {'Key': LAST_ACTION_TIME_TAG, 'Value': datetime.now(timezone('UTC')).strftime('%Y-%m-%dT%H:%M:%SZ')},
+        {'Key': WINDOW_TAG, 'Value': window},
+        {'Key': PLAN_VERSION_TAG, 'Value': version},
+    ]
+
+def already_applied(tags, applied_windows):
+    """
+    Check a resource's tags against the (window, plan version) pairs due in this run.
+    """
+    return (tags.get(WINDOW_TAG), tags.get(PLAN_VERSION_TAG)) in applied_windows
+
+def write_ec2_state_tags(ec2_client, instance_ids, tags):
+    """
+    Tag many EC2 instances with one CreateTags call per batch.
+    """
+    for i in range(0, len(instance_ids), EC2_TAG_BATCH_SIZE):
+        batch = instance_ids[i:i + EC2_TAG_BATCH_SIZE]
+        try:
+            ec2_client.create_tags(Resources=batch, Tags=tags)
+        except Exception as e:
+            logger.error('Error writing state tags to EC2 instances %s: %s', batch, e)
+
+def write_rds_state_tags(rds_client, arns, tags):
+    """
+    Tag RDS resources concurrently; the RDS API takes one ARN per call.
+    """
+    def tag_resource(arn):
+        try:
+            rds_client.add_tags_to_resource(ResourceName=arn, Tags=tags)
+        except Exception as e:
+            logger.error('Error writing state tags to RDS resource %s: %s', arn, e)
+
+    with ThreadPoolExecutor(max_workers=RDS_TAG_WORKERS) as executor:
+        list(executor.map(tag_resource, arns))
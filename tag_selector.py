@@ -0,0 +1,121 @@
+import os
+import re
+from functools import lru_cache
+
+# Default resource selection; override with the SCHEDULE_SELECTOR environment variable
+DEFAULT_SELECTOR = 'Schedule=On AND Plan EXISTS'
+SCHEDULE_SELECTOR = os.getenv('SCHEDULE_SELECTOR', DEFAULT_SELECTOR)
+
+_TOKEN = r'(?:"[^"]*"|\'[^\']*\'|[^\s=!(),]+)'
+_TERMS = [
+    ('not_exists', re.compile(rf'^({_TOKEN})\s+NOT\s+EXISTS$', re.IGNORECASE)),
+    ('exists', re.compile(rf'^({_TOKEN})\s+EXISTS$', re.IGNORECASE)),
+    ('not_in', re.compile(rf'^({_TOKEN})\s+NOT\s+IN\s*\((.*)\)$', re.IGNORECASE)),
+    ('in', re.compile(rf'^({_TOKEN})\s+IN\s*\((.*)\)$', re.IGNORECASE)),
+    ('ne', re.compile(rf'^({_TOKEN})\s*!=\s*({_TOKEN})$')),
+    ('eq', re.compile(rf'^({_TOKEN})\s*=\s*({_TOKEN})$')),
+]
+
+def _unquote(token):
+    token = token.strip()
+    if len(token) >= 2 and token[0] == token[-1] and token[0] in '"\'':
+        return token[1:-1]
+    return token
+
+def _split_unquoted(text, separator):
+    """
+    Split text on a separator pattern, ignoring separators inside quoted values.
+    """
+    parts = []
+    start = 0
+    for match in re.finditer(rf'"[^"]*"|\'[^\']*\'|({separator})', text, re.IGNORECASE):
+        if match.group(1):
+            parts.append(text[start:match.start()])
+            start = match.end()
+    parts.append(text[start:])
+    return parts
+
+def parse_selector(expression):
+    """
+    Parse 'Key=Value AND Key EXISTS AND Key IN (a,b)' into a list of (key, operator, values).
+    Supported operators: =, !=, EXISTS, NOT EXISTS, IN (...), NOT IN (...). Terms are joined with AND.
+    """
+    terms = []
+    for part in _split_unquoted(expression.strip(), r'\s+AND\s+'):
+        for operator, pattern in _TERMS:
+            match = pattern.match(part.strip())
+            if match:
+                break
+        else:
+            raise ValueError(f'Cannot parse selector term: {part!r}')
+        key = _unquote(match.group(1))
+        if operator in ('exists', 'not_exists'):
+            values = ()
+        elif operator in ('in', 'not_in'):
+            values = tuple(_unquote(value) for value in _split_unquoted(match.group(2), ',') if value.strip())
+            if not values:
+                # EC2 rejects a filter with no values, and an empty list matches nothing anyway
+                raise ValueError(f'Empty value list in selector term: {part!r}')
+        else:
+            values = (_unquote(match.group(2)),)
+        terms.append((key, operator, values))
+    return terms
+
+def ec2_filters(terms):
+    """
+    Translate the terms EC2 can evaluate server-side into DescribeInstances filters.
+    """
+    filters = []
+    for key, operator, values in terms:
+        if operator in ('eq', 'in'):
+            filters.append({'Name': f'tag:{key}', 'Values': list(values)})
+        elif operator == 'exists':
+            filters.append({'Name': 'tag-key', 'Values': [key]})
+    return filters
+
+def tagging_filters(terms):
+    """
+    Translate the terms the Resource Groups Tagging API can evaluate into GetResources TagFilters.
+    """
+    filters = []
+    for key, operator, values in terms:
+        if operator in ('eq', 'in'):
+            filters.append({'Key': key, 'Values': list(values)})
+        elif operator == 'exists':
+            filters.append({'Key': key})
+    return filters
+
+def build_predicate(terms):
+    """
+    Build a predicate over a tag dict that checks every term.
+    """
+    checks = []
+    for key, operator, values in terms:
+        if operator == 'eq':
+            checks.append(lambda tags, key=key, value=values[0]: tags.get(key) == value)
+        elif operator == 'ne':
+            checks.append(lambda tags, key=key, value=values[0]: tags.get(key) != value)
+        elif operator == 'exists':
+            checks.append(lambda tags, key=key: key in tags)
+        elif operator == 'not_exists':
+            checks.append(lambda tags, key=key: key not in tags)
+        elif operator == 'in':
+            checks.append(lambda tags, key=key, values=frozenset(values): tags.get(key) in values)
+        elif operator == 'not_in':
+            checks.append(lambda tags, key=key, values=frozenset(values): tags.get(key) not in values)
+    return lambda tags: all(check(tags) for check in checks)
+
+@lru_cache(maxsize=32)
+def compile_selector(expression=SCHEDULE_SELECTOR):
+    """
+    Compile a selector into (EC2 filters, local predicate over a tag dict).
+    Callers that cannot filter server-side (RDS) rely on the predicate alone.
+    """
+    terms = parse_selector(expression)
+    return ec2_filters(terms), build_predicate(terms)
+
+def tags_to_dict(tag_list):
+    """
+    Convert an AWS [{'Key': ..., 'Value': ...}] tag list to a dict.
+    """
+    return {tag['Key']: tag['Value'] for tag in tag_list}
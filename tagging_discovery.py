@@ -0,0 +1,112 @@
+import logging
+import os
+from tag_selector import parse_selector, tagging_filters, build_predicate, tags_to_dict, SCHEDULE_SELECTOR
+from state_tags import already_applied
+
+logger = logging.getLogger()
+
+# DISCOVERY=tagging finds scheduled resources through tag:GetResources instead of per-service describes
+DISCOVERY = os.getenv('DISCOVERY', 'describe')
+RESOURCE_TYPES = {'ec2:instance': 'ec2', 'rds:db': 'rds_instance', 'rds:cluster': 'rds_cluster'}
+RESOURCES_PER_PAGE = 100
+# Identifier filters accept at most this many values per describe call
+DESCRIBE_CHUNK = 100
+
+def parse_arn(arn):
+    """
+    Split an EC2 instance, RDS instance or RDS cluster ARN into (kind, resource_id, region), or None.
+    """
+    parts = arn.split(':', 5)
+    if len(parts) < 6:
+        return None
+    service, region, resource = parts[2], parts[3], parts[5]
+    if service == 'ec2' and resource.startswith('instance/'):
+        return ('ec2', resource.split('/', 1)[1], region)
+    if service == 'rds' and resource.startswith('db:'):
+        return ('rds_instance', resource[3:], region)
+    if service == 'rds' and resource.startswith('cluster:'):
+        return ('rds_cluster', resource[8:], region)
+    return None
+
+def iter_tagged_resources(tagging_client, tag_filters, resource_types=tuple(RESOURCE_TYPES)):
+    """
+    Yield (kind, resource_id, region, arn, tags) for every resource matching the tag filters.
+    """
+    paginator = tagging_client.get_paginator('get_resources')
+    for page in paginator.paginate(TagFilters=tag_filters, ResourceTypeFilters=list(resource_types), ResourcesPerPage=RESOURCES_PER_PAGE):
+        for mapping in page['ResourceTagMappingList']:
+            parsed = parse_arn(mapping['ResourceARN'])
+            if parsed:
+                kind, resource_id, region = parsed
+                yield (kind, resource_id, region, mapping['ResourceARN'], tags_to_dict(mapping.get('Tags', [])))
+
+def describe_states(ec2_client, rds_client, kind, resource_ids):
+    """
+    Return {resource_id: (state, type, hibernation configured)} for the given resources, in chunked describe calls.
+    """
+    states = {}
+    for i in range(0, len(resource_ids), DESCRIBE_CHUNK):
+        chunk = resource_ids[i:i + DESCRIBE_CHUNK]
+        if kind == 'ec2':
+            pages = ec2_client.get_paginator('describe_instances').paginate(Filters=[{'Name': 'instance-id', 'Values': chunk}])
+            for page in pages:
+                for reservation in page['Reservations']:
+                    for instance in reservation['Instances']:
+                        states[instance['InstanceId']] = (instance['State']['Name'], instance.get('InstanceType'), instance.get('HibernationOptions', {}).get('Configured', False))
+        elif kind == 'rds_cluster':
+            for page in rds_client.get_paginator('describe_db_clusters').paginate(Filters=[{'Name': 'db-cluster-id', 'Values': chunk}]):
+                for cluster in page['DBClusters']:
+                    states[cluster['DBClusterIdentifier']] = (cluster['Status'], cluster.get('Engine'), False)
+        else:
+            for page in rds_client.get_paginator('describe_db_instances').paginate(Filters=[{'Name': 'db-instance-id', 'Values': chunk}]):
+                for instance in page['DBInstances']:
+                    states[instance['DBInstanceIdentifier']] = (instance['DBInstanceStatus'], instance.get('DBInstanceClass'), False)
+    return states
+
+def restrict_to_plans(tag_filters, plans):
+    """
+    Replace any Plan TagFilter (EXISTS or a value list) with one listing the plans it allows.
+    """
+    allowed = set(plans)
+    for tag_filter in tag_filters:
+        if tag_filter['Key'] == 'Plan' and 'Values' in tag_filter:
+            allowed &= set(tag_filter['Values'])
+    return [tag_filter for tag_filter in tag_filters if tag_filter['Key'] != 'Plan'] + [{'Key': 'Plan', 'Values': sorted(allowed)}]
+
+def discover_region(tagging_client, ec2_client, rds_client, plans, applied_windows=None, selector=None):
+    """
+    Find scheduled resources in one region with a single tag:GetResources stream, then describe
+    state only for those whose plan is in plans. Returns {kind: [resource tuples]} in the same
+    (resource_id, region, plan_name, state, details) shape as the describe-based discovery.
+    """
+    terms = parse_selector(selector or SCHEDULE_SELECTOR)
+    matches = build_predicate(terms)
+    tag_filters = restrict_to_plans(tagging_filters(terms), plans)
+
+    candidates = {kind: {} for kind in RESOURCE_TYPES.values()}
+    # A selector that rules out every due plan leaves nothing to look up
+    tagged = iter_tagged_resources(tagging_client, tag_filters) if tag_filters[-1]['Values'] else ()
+    for kind, resource_id, region, arn, tags in tagged:
+        if not matches(tags) or tags.get('Plan') not in plans:
+            continue
+        if applied_windows and already_applied(tags, applied_windows):
+            continue
+        candidates[kind][resource_id] = (region, arn, tags)
+
+    found = {}
+    for kind, by_id in candidates.items():
+        states = describe_states(ec2_client, rds_client, kind, list(by_id)) if by_id else {}
+        found[kind] = []
+        for resource_id, (region, arn, tags) in by_id.items():
+            if resource_id not in states:
+                # Tagging results lag behind deletes; a resource that no longer describes is gone
+                logger.warning('Skipping %s %s: tagged but not found by describe', kind, resource_id)
+                continue
+            state, resource_type, hibernation = states[resource_id]
+            details = {'tags': tags, 'type': resource_type}
+            if kind == 'ec2':
+                details['hibernation'] = hibernation
+            else:
+                details['arn'] = arn
+            found[kind].append((resource_id, region, tags['Plan'], state, details))
+    return found
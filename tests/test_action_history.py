@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+from pytz import utc
+from action_history import run_rows, append_history, load_history, aggregate, compact_month, month_partitions
+
+T0 = datetime(2026, 10, 1, tzinfo=utc)
+HOUR = timedelta(hours=1)
+
+
+def ec2(resource_id, state, plan='p', region='us-east-1'):
+    return ('ec2', (resource_id, region, plan, state, {}))
+
+
+def record(directory, at, observed, confirmed=()):
+    append_history(run_rows(observed, list(confirmed), '123456789012', at, at), str(directory))
+
+
+def totals(directory, since, until, by=('plan',)):
+    history = load_history(since, until, str(directory))
+    return {result['plan']: result for result in aggregate(history, int(since.timestamp()), int(until.timestamp()), by)}
+
+
+def test_running_time_is_summed_between_observations(tmp_path):
+    record(tmp_path, T0, [ec2('i-1', 'running')])
+    record(tmp_path, T0 + 3 * HOUR, [ec2('i-1', 'stopped')])
+    record(tmp_path, T0 + 5 * HOUR, [ec2('i-1', 'stopped')])
+    result = totals(tmp_path, T0, T0 + 5 * HOUR)['p']
+    assert (result['resources'], result['uptime_hours'], result['avoided_hours']) == (1, 3.0, 0.0)
+
+
+def test_time_after_a_scheduler_stop_counts_as_avoided(tmp_path):
+    record(tmp_path, T0, [ec2('i-1', 'running')])
+    record(tmp_path, T0 + 2 * HOUR, [ec2('i-1', 'running')], [('w', 'ec2', 'i-1', 'us-east-1', 'stop')])
+    record(tmp_path, T0 + 6 * HOUR, [ec2('i-1', 'stopped')])
+    record(tmp_path, T0 + 8 * HOUR, [ec2('i-1', 'running')])
+    result = totals(tmp_path, T0, T0 + 8 * HOUR)['p']
+    assert (result['uptime_hours'], result['avoided_hours']) == (2.0, 6.0)
+
+
+def test_last_row_is_held_only_until_the_last_recorded_run(tmp_path):
+    record(tmp_path, T0, [ec2('i-gone', 'running'), ec2('i-1', 'running')])
+    record(tmp_path, T0 + 2 * HOUR, [ec2('i-1', 'running')])
+    result = totals(tmp_path, T0, T0 + 10 * 24 * HOUR)['p']
+    assert (result['resources'], result['uptime_hours']) == (2, 4.0)
+
+
+def test_groups_are_split_by_plan(tmp_path):
+    record(tmp_path, T0, [ec2('i-1', 'running', plan='a'), ec2('i-2', 'stopped', plan='b')])
+    record(tmp_path, T0 + HOUR, [ec2('i-1', 'running', plan='a'), ec2('i-2', 'stopped', plan='b')])
+    results = totals(tmp_path, T0, T0 + HOUR)
+    assert results['a']['uptime_hours'] == 1.0
+    assert results['b']['uptime_hours'] == 0.0
+
+
+def test_compaction_keeps_the_same_totals(tmp_path):
+    for hour in range(4):
+        record(tmp_path, T0 + hour * HOUR, [ec2('i-1', 'running' if hour < 2 else 'stopped')])
+    before = totals(tmp_path, T0, T0 + 3 * HOUR)
+    compact_month(str(tmp_path), '2026-10')
+    assert len(month_partitions(str(tmp_path), '2026-10')) == 1
+    assert totals(tmp_path, T0, T0 + 3 * HOUR) == before
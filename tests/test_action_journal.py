@@ -0,0 +1,62 @@
+import json
+from datetime import datetime, timedelta
+from pytz import utc
+from aws_instance_scheduler_allv2 import settled_entry
+from action_journal import (append_entries, completed_keys, outstanding_keys, prune_journal, read_entries, transition_window,
+                            PLANNED, DISPATCHED, CONFIRMED, FAILED)
+
+WINDOW = transition_window('p', 'stop', datetime(2026, 10, 19, 18, 0))
+
+
+def entry(resource_id, kind='ec2'):
+    return (WINDOW, kind, resource_id, 'us-east-1', 'stop')
+
+
+def test_window_is_per_plan_action_and_minute():
+    assert WINDOW == 'p:stop:2026-10-19T18:00'
+
+
+def test_replay_after_a_crash_returns_unconfirmed_actions(tmp_path):
+    path = str(tmp_path / 'journal.ndjson')
+    append_entries(path, [entry('i-1'), entry('i-2'), entry('i-3'), entry('i-4')], PLANNED)
+    append_entries(path, [entry('i-2'), entry('i-3'), entry('i-4')], DISPATCHED)
+    append_entries(path, [entry('i-3')], CONFIRMED)
+    append_entries(path, [entry('i-4')], FAILED, error='IncorrectInstanceState')
+    # A crash mid-write leaves a torn last line
+    with open(path, 'a') as journal:
+        journal.write('{"ts": "2026-10-19T18:00')
+    assert outstanding_keys(path) == {(WINDOW, 'ec2', 'i-1'), (WINDOW, 'ec2', 'i-2'), (WINDOW, 'ec2', 'i-4')}
+    assert completed_keys(path) == {(WINDOW, 'ec2', 'i-3')}
+
+
+def test_later_status_wins_per_key(tmp_path):
+    path = str(tmp_path / 'journal.ndjson')
+    append_entries(path, [entry('i-1')], FAILED, error='Throttling')
+    append_entries(path, [entry('i-1')], CONFIRMED)
+    assert outstanding_keys(path) == set()
+    assert completed_keys(path) == {(WINDOW, 'ec2', 'i-1')}
+
+
+def test_missing_journal_is_empty(tmp_path):
+    path = str(tmp_path / 'journal.ndjson')
+    assert outstanding_keys(path) == set()
+    prune_journal(path)
+    assert list(read_entries(path)) == []
+
+
+def test_prune_drops_old_entries(tmp_path):
+    path = tmp_path / 'journal.ndjson'
+    old = {'ts': (datetime.now(utc) - timedelta(days=8)).isoformat(), 'window': WINDOW, 'kind': 'ec2',
+           'resource_id': 'i-old', 'region': 'us-east-1', 'action': 'stop', 'status': PLANNED}
+    path.write_text(json.dumps(old) + '\n')
+    append_entries(str(path), [entry('i-new')], PLANNED)
+    prune_journal(str(path))
+    assert outstanding_keys(str(path)) == {(WINDOW, 'ec2', 'i-new')}
+
+
+def test_outstanding_action_that_took_effect_is_settled():
+    outstanding = {(WINDOW, 'ec2', 'i-1'), (WINDOW, 'ec2', 'i-2')}
+    due, windows = {'p': 'stop'}, {'p': WINDOW}
+    assert settled_entry('ec2', ('i-1', 'us-east-1', 'p', 'stopped', {}), due, windows, outstanding) == entry('i-1')
+    assert settled_entry('ec2', ('i-2', 'us-east-1', 'p', 'running', {}), due, windows, outstanding) is None
+    assert settled_entry('ec2', ('i-3', 'us-east-1', 'p', 'stopped', {}), due, windows, outstanding) is None
@@ -0,0 +1,46 @@
+import json
+import boto3
+import pytest
+from cassette import attach_player, request_key, _tapes
+from resilience import attach_resilience, CircuitBreaker, CircuitOpenError
+
+
+def ec2_client(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    return boto3.client('ec2', region_name='us-east-1')
+
+
+def write_cassette(directory, operation, params, parsed):
+    with open(directory / 'ec2-us-east-1.ndjson', 'w') as file:
+        file.write(json.dumps({'key': request_key(operation, params), 'operation': operation, 'status': 200,
+                               'latency': 0, 'parsed': parsed}) + '\n')
+    _tapes.clear()
+
+
+def test_key_ignores_state_tag_timestamps_and_due_plans():
+    def tags(when):
+        return {'Resources': ['i-1'], 'Tags': [{'Key': 'SchedulerLastAction', 'Value': 'stop'},
+                                               {'Key': 'SchedulerLastActionTime', 'Value': when},
+                                               {'Key': 'SchedulerWindow', 'Value': f'p:stop:{when}'}]}
+    assert request_key('CreateTags', tags('2026-10-19T08:00')) == request_key('CreateTags', tags('2026-10-20T18:00'))
+    assert request_key('DescribeInstances', {'Filters': [{'Name': 'tag:Plan', 'Values': ['a']}]}) == \
+        request_key('DescribeInstances', {'Filters': [{'Name': 'tag:Plan', 'Values': ['a', 'b']}]})
+    assert request_key('CreateTags', {'Resources': ['i-1']}) != request_key('CreateTags', {'Resources': ['i-2']})
+
+
+def test_replay_serves_a_run_recorded_for_other_plans(tmp_path, monkeypatch):
+    write_cassette(tmp_path, 'DescribeInstances', {'Filters': [{'Name': 'tag:Plan', 'Values': ['a']}]},
+                   {'Reservations': [{'Instances': [{'InstanceId': 'i-1'}]}]})
+    client = attach_player(ec2_client(monkeypatch), directory=str(tmp_path), latency_scale=0)
+    response = client.describe_instances(Filters=[{'Name': 'tag:Plan', 'Values': ['b']}])
+    assert response['Reservations'][0]['Instances'][0]['InstanceId'] == 'i-1'
+
+
+def test_replay_still_runs_the_circuit_breaker_check(tmp_path, monkeypatch):
+    write_cassette(tmp_path, 'DescribeInstances', {}, {'Reservations': []})
+    breaker = CircuitBreaker(threshold=1)
+    breaker.record_failure(('us-east-1', 'ec2'), 'Unavailable')
+    client = attach_resilience(attach_player(ec2_client(monkeypatch), directory=str(tmp_path), latency_scale=0), breaker)
+    with pytest.raises(CircuitOpenError):
+        client.describe_instances()
@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta
+from pytz import utc
+import aws_instance_scheduler_allv2 as scheduler
+from last_run import load_last_run
+
+NOW = datetime(2026, 10, 19, 17, 0, tzinfo=utc)
+TRANSITIONS = {'a': ('stop', NOW - timedelta(minutes=30)), 'b': ('start', NOW - timedelta(minutes=10))}
+
+
+def test_fully_applied_run_advances_to_now(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    scheduler.advance_last_run(NOW, None, TRANSITIONS, set())
+    assert load_last_run() == NOW
+
+
+def test_unresolved_plan_keeps_its_transition_in_the_next_window(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    scheduler.advance_last_run(NOW, None, TRANSITIONS, {'a', 'b'})
+    assert load_last_run() == NOW - timedelta(minutes=31)
+
+
+def test_last_run_never_moves_backwards(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    last_run = NOW - timedelta(minutes=20)
+    scheduler.advance_last_run(NOW, last_run, TRANSITIONS, {'a'})
+    assert load_last_run() == last_run
+
+
+def test_nothing_is_written_after_the_lock_is_lost(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scheduler, 'run_lock_lost', lambda: True)
+    scheduler.advance_last_run(NOW, None)
+    assert load_last_run() is None
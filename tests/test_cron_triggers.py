@@ -0,0 +1,46 @@
+from datetime import date, datetime, time
+from pytz import timezone, utc
+from cron_triggers import local_occurrences, transition_instants, compile_triggers, format_field, to_cron
+
+EASTERN = timezone('US/Eastern')
+WEEKDAYS_8_TO_18 = {'p': {'start_time': '08:00', 'stop_time': '18:00', 'start_days': [1, 2, 3, 4, 5],
+                          'stop_days': [1, 2, 3, 4, 5], 'timezone': 'US/Eastern'}}
+
+
+def test_time_in_spring_forward_gap_never_occurs():
+    assert local_occurrences(date(2026, 3, 8), time(2, 30), EASTERN) == set()
+
+
+def test_time_repeated_at_fall_back_occurs_twice():
+    assert local_occurrences(date(2026, 11, 1), time(1, 30), EASTERN) == {
+        datetime(2026, 11, 1, 5, 30, tzinfo=utc), datetime(2026, 11, 1, 6, 30, tzinfo=utc)}
+
+
+def test_ordinary_time_occurs_once():
+    assert local_occurrences(date(2026, 6, 1), time(8, 0), EASTERN) == {datetime(2026, 6, 1, 12, 0, tzinfo=utc)}
+
+
+def test_weekday_schedule_compiles_to_one_trigger_per_utc_offset():
+    triggers = compile_triggers(transition_instants(WEEKDAYS_8_TO_18, date(2026, 1, 1)))
+    assert triggers == [([0], [12, 22], [1, 2, 3, 4, 5], [3, 4, 5, 6, 7, 8, 9, 10]),
+                        ([0], [13, 23], [1, 2, 3, 4, 5], [1, 2, 3, 11, 12])]
+
+
+def test_every_transition_is_covered_by_a_trigger():
+    instants = transition_instants(WEEKDAYS_8_TO_18, date(2026, 1, 1))
+    triggers = compile_triggers(instants)
+    for instant in instants:
+        assert any(instant.minute in minutes and instant.hour in hours and instant.isoweekday() in weekdays
+                   and instant.month in months for minutes, hours, weekdays, months in triggers)
+
+
+def test_format_field_collapses_runs_and_full_ranges():
+    assert format_field([0, 1, 2, 5, 7, 8], range(24)) == '0-2,5,7,8'
+    assert format_field(list(range(60)), range(60)) == '*'
+
+
+def test_to_cron_styles():
+    trigger = ([0], [12, 22], [1, 2, 3, 4, 5], [3, 4, 5, 6, 7, 8, 9, 10])
+    assert to_cron(trigger) == '0 12,22 * 3-10 1-5'
+    assert to_cron(trigger, style='eventbridge') == 'cron(0 12,22 ? 3-10 2-6 *)'
+    assert to_cron(([30], [6], [1, 2, 3, 4, 5, 6, 7], list(range(1, 13))), style='eventbridge') == 'cron(30 6 * * ? *)'
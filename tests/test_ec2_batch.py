@@ -0,0 +1,76 @@
+from botocore.exceptions import ClientError
+from ec2_batch import call_with_bisection, call_in_batches
+
+BAD = 'i-0000000000000000b'
+IDS = ['i-00000000000000001', 'i-00000000000000002', BAD, 'i-00000000000000003']
+
+
+def client_error(code, message=''):
+    return ClientError({'Error': {'Code': code, 'Message': message}}, 'StartInstances')
+
+
+def failing_on(bad_ids, message=True):
+    calls = []
+
+    def call(batch):
+        calls.append(list(batch))
+        named = [instance_id for instance_id in batch if instance_id in bad_ids]
+        if named:
+            raise client_error('IncorrectInstanceState', f"The instance '{named[0]}' is not in a state" if message else 'Bad state')
+    return call, calls
+
+
+def test_all_succeed_in_one_call():
+    call, calls = failing_on(set())
+    assert call_with_bisection(call, IDS) == (IDS, [])
+    assert calls == [IDS]
+
+
+def test_named_id_is_dropped_and_rest_retried_together():
+    call, calls = failing_on({BAD})
+    succeeded, failed = call_with_bisection(call, IDS)
+    assert sorted(succeeded) == sorted(i for i in IDS if i != BAD)
+    assert failed == [(BAD, 'IncorrectInstanceState')]
+    assert len(calls) == 2
+
+
+def test_unnamed_error_bisects_down_to_the_bad_id():
+    call, calls = failing_on({BAD}, message=False)
+    succeeded, failed = call_with_bisection(call, IDS)
+    assert sorted(succeeded) == sorted(i for i in IDS if i != BAD)
+    assert failed == [(BAD, 'IncorrectInstanceState')]
+
+
+def test_throttling_keeps_partial_successes_and_fails_the_rest():
+    calls = []
+
+    def call(batch):
+        calls.append(list(batch))
+        if len(calls) == 1:
+            raise client_error('IncorrectInstanceState', 'Bad state')
+        if len(calls) == 3:
+            raise client_error('RequestLimitExceeded')
+
+    succeeded, failed = call_with_bisection(call, IDS)
+    assert succeeded == IDS[:2]
+    assert failed == [(instance_id, 'RequestLimitExceeded') for instance_id in IDS[2:]]
+
+
+def test_non_client_error_aborts_with_its_type_name():
+    def call(batch):
+        raise TimeoutError('read timed out')
+
+    assert call_with_bisection(call, IDS) == ([], [(instance_id, 'TimeoutError') for instance_id in IDS])
+
+
+def test_batches_after_an_aborted_one_are_not_called():
+    calls = []
+
+    def call(batch):
+        calls.append(list(batch))
+        raise client_error('Throttling')
+
+    succeeded, failed = call_in_batches(call, IDS, batch_size=2)
+    assert calls == [IDS[:2]]
+    assert succeeded == []
+    assert failed == [(instance_id, 'Throttling') for instance_id in IDS]
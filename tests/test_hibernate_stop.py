@@ -0,0 +1,43 @@
+from botocore.exceptions import ClientError
+from aws_instance_scheduler_allv2 import stop_ec2_instances
+
+HIBERNATING = 'i-00000000000000001'
+REFUSED = 'i-00000000000000002'
+BROKEN = 'i-00000000000000003'
+
+
+class FakeEc2:
+    def __init__(self, refuse_code='UnsupportedHibernationConfiguration'):
+        self.refuse_code = refuse_code
+        self.calls = []
+
+    def stop_instances(self, InstanceIds, Hibernate):
+        self.calls.append((list(InstanceIds), Hibernate))
+        for instance_id in InstanceIds:
+            if instance_id == BROKEN:
+                raise ClientError({'Error': {'Code': 'IncorrectInstanceState', 'Message': f"The instance '{instance_id}' is not running"}}, 'StopInstances')
+            if Hibernate and instance_id == REFUSED:
+                raise ClientError({'Error': {'Code': self.refuse_code, 'Message': f"Hibernation not ready for '{instance_id}'"}}, 'StopInstances')
+
+
+def test_refused_hibernation_falls_back_to_a_plain_stop():
+    ec2 = FakeEc2()
+    succeeded, failed = stop_ec2_instances(ec2, [HIBERNATING, REFUSED], hibernate=True)
+    assert sorted(succeeded) == [HIBERNATING, REFUSED]
+    assert failed == []
+    assert ec2.calls[-1] == ([REFUSED], False)
+
+
+def test_other_errors_are_not_retried_as_plain_stops():
+    ec2 = FakeEc2()
+    succeeded, failed = stop_ec2_instances(ec2, [HIBERNATING, BROKEN], hibernate=True)
+    assert succeeded == [HIBERNATING]
+    assert failed == [(BROKEN, 'IncorrectInstanceState')]
+    assert all(hibernate for ids, hibernate in ec2.calls)
+
+
+def test_plain_stop_has_no_fallback():
+    ec2 = FakeEc2()
+    succeeded, failed = stop_ec2_instances(ec2, [HIBERNATING, BROKEN])
+    assert failed == [(BROKEN, 'IncorrectInstanceState')]
+    assert not any(hibernate for ids, hibernate in ec2.calls)
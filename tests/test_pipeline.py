@@ -0,0 +1,56 @@
+import threading
+from pipeline import run_pipeline
+
+
+def run_with_timeout(*args, **kwargs):
+    outcome = {}
+    thread = threading.Thread(target=lambda: outcome.update(result=run_pipeline(*args, **kwargs)), daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive(), 'pipeline did not terminate'
+    return outcome['result']
+
+
+def numbers(count):
+    return lambda: iter(range(count))
+
+
+def test_every_decided_item_is_dispatched():
+    results, errors = run_with_timeout([numbers(100), numbers(50)], lambda item: item, lambda entry: entry % 3,
+                                       lambda batch: batch, queue_size=4, batch_size=7, flush_seconds=0.05, workers=2)
+    assert sorted(results) == sorted(list(range(100)) + list(range(50)))
+    assert errors == []
+
+
+def test_failing_decide_drains_the_pipeline():
+    def decide(item):
+        if item % 10 == 0:
+            raise ValueError(item)
+        return item
+
+    # A queue far smaller than the input would block the producers if the decide stage stopped draining
+    results, errors = run_with_timeout([numbers(500)], decide, lambda entry: 0, lambda batch: batch,
+                                       queue_size=2, batch_size=5, flush_seconds=0.05, workers=1)
+    assert len(results) == 450
+    assert len(errors) == 50
+
+
+def test_failing_source_batch_key_and_dispatch_still_terminate():
+    def broken_source():
+        yield 1
+        raise RuntimeError('endpoint down')
+
+    def batch_key(entry):
+        if entry == 3:
+            raise KeyError(entry)
+        return 0
+
+    def dispatch(batch):
+        if 4 in batch:
+            raise RuntimeError('dispatch failed')
+        return batch
+
+    results, errors = run_with_timeout([broken_source, numbers(5)], lambda item: item, batch_key, dispatch,
+                                       queue_size=2, batch_size=1, flush_seconds=0.05, workers=2)
+    assert sorted(results) == [0, 1, 1, 2]
+    assert len(errors) == 2
@@ -0,0 +1,57 @@
+import time
+import resilience
+from resilience import CircuitBreaker, start_run, remaining_seconds, deadline_passed, client_config
+
+KEY = ('us-east-1', 'ec2')
+
+
+def test_circuit_opens_after_the_threshold_of_consecutive_failures():
+    breaker = CircuitBreaker(threshold=3, cooldown_seconds=60)
+    breaker.record_failure(KEY, 'Unavailable')
+    breaker.record_failure(KEY, 'Unavailable')
+    breaker.record_success(KEY)
+    breaker.record_failure(KEY, 'Unavailable')
+    breaker.record_failure(KEY, 'Unavailable')
+    assert not breaker.is_open(KEY)
+    breaker.record_failure(KEY, 'Unavailable')
+    assert breaker.is_open(KEY)
+    assert not breaker.is_open(('us-west-2', 'ec2'))
+
+
+def test_circuit_half_opens_after_the_cooldown_for_one_trial():
+    breaker = CircuitBreaker(threshold=1, cooldown_seconds=0.05)
+    breaker.record_failure(KEY, 'Unavailable')
+    assert breaker.is_open(KEY)
+    time.sleep(0.06)
+    assert not breaker.is_open(KEY)
+    # Only the one trial call goes through while it is outstanding
+    assert breaker.is_open(KEY)
+
+
+def test_failed_trial_reopens_and_successful_trial_closes():
+    breaker = CircuitBreaker(threshold=1, cooldown_seconds=0.05)
+    breaker.record_failure(KEY, 'Unavailable')
+    time.sleep(0.06)
+    assert not breaker.is_open(KEY)
+    breaker.record_failure(KEY, 'Unavailable')
+    assert breaker.is_open(KEY)
+    time.sleep(0.06)
+    assert not breaker.is_open(KEY)
+    breaker.record_success(KEY)
+    assert not breaker.is_open(KEY)
+    assert not breaker.is_open(KEY)
+
+
+def test_start_run_sets_the_deadline_and_closes_circuits():
+    resilience.BREAKER.record_failure(KEY, 'Unavailable')
+    resilience.BREAKER.record_failure(KEY, 'Unavailable')
+    resilience.BREAKER.record_failure(KEY, 'Unavailable')
+    start_run(0.05)
+    assert not resilience.BREAKER.is_open(KEY)
+    assert not deadline_passed()
+    assert client_config().read_timeout == 1.0
+    time.sleep(0.06)
+    assert deadline_passed()
+    start_run(0)
+    assert remaining_seconds() is None
+    assert not deadline_passed()
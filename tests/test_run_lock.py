@@ -0,0 +1,73 @@
+import time
+import pytest
+import run_lock
+from run_lock import FileLockBackend, LocalTableStandIn, RunLock, hold_run_lock, run_lock_lost
+
+
+@pytest.fixture(params=['file', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'file':
+        return FileLockBackend(str(tmp_path / 'scheduler.lock'))
+    return LocalTableStandIn(str(tmp_path / 'locks.db'))
+
+
+def test_unexpired_lease_cannot_be_taken(backend):
+    assert backend.acquire('lock', 'first', 60)
+    assert not backend.acquire('lock', 'second', 60)
+    assert not backend.renew('lock', 'second', 60)
+    assert backend.acquire('lock', 'first', 60)
+
+
+def test_expired_lease_can_be_taken_over(backend):
+    assert backend.acquire('lock', 'first', 0.05)
+    time.sleep(0.1)
+    assert backend.acquire('lock', 'second', 60)
+    assert not backend.renew('lock', 'first', 60)
+
+
+def test_release_only_by_the_owner(backend):
+    assert backend.acquire('lock', 'first', 60)
+    backend.release('lock', 'second')
+    assert not backend.acquire('lock', 'second', 60)
+    backend.release('lock', 'first')
+    assert backend.acquire('lock', 'second', 60)
+
+
+def test_lock_is_lost_when_another_run_takes_over(backend):
+    lock = RunLock(backend, name='lock', lease_seconds=0.15)
+    assert lock.acquire(wait_seconds=0)
+    # As if the lease had expired during a stall and another run had taken it
+    backend.release('lock', lock.owner)
+    assert backend.acquire('lock', 'other', 60)
+    assert lock.lost.wait(2)
+    lock.release()
+    assert not backend.acquire('lock', 'third', 60)
+
+
+def test_lock_is_lost_when_renewals_fail_past_the_lease():
+    class Unreachable:
+        def acquire(self, name, owner, lease_seconds):
+            return True
+
+        def renew(self, name, owner, lease_seconds):
+            raise ConnectionError('endpoint down')
+
+        def release(self, name, owner):
+            pass
+
+    lock = RunLock(Unreachable(), name='lock', lease_seconds=0.15)
+    assert lock.acquire(wait_seconds=0)
+    assert lock.lost.wait(2)
+    lock.release()
+
+
+def test_hold_run_lock_reports_loss_only_while_held(tmp_path):
+    backend = FileLockBackend(str(tmp_path / 'scheduler.lock'))
+    with hold_run_lock(backend, wait_seconds=0) as acquired:
+        assert acquired
+        assert not run_lock_lost()
+        run_lock._held.lost.set()
+        assert run_lock_lost()
+        with hold_run_lock(FileLockBackend(str(tmp_path / 'scheduler.lock')), wait_seconds=0) as second:
+            assert not second
+    assert not run_lock_lost()
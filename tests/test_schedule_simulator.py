@@ -0,0 +1,40 @@
+from datetime import datetime
+from pytz import timezone
+import pytest
+from schedule_simulator import simulate
+
+WEEKDAYS = [1, 2, 3, 4, 5]
+SCHEDULE = {
+    'overnight': {'start_days': WEEKDAYS, 'stop_days': WEEKDAYS, 'start_time': '18:00', 'stop_time': '08:00'},
+    'daytime': {'start_days': WEEKDAYS, 'stop_days': WEEKDAYS, 'start_time': '08:00', 'stop_time': '18:00'},
+}
+# Monday 00:00 local
+MONDAY = timezone('US/Eastern').localize(datetime(2026, 10, 19))
+
+
+def inventory(plan, state, count=1):
+    return [{'kind': 'ec2', 'resource_id': f'i-{plan}-{n}', 'region': 'us-east-1', 'plan': plan, 'state': state} for n in range(count)]
+
+
+@pytest.mark.parametrize('resolution', [1, 7, 60])
+def test_overnight_plan_runs_from_start_to_next_stop(resolution):
+    result = simulate(inventory('overnight', 'stopped', 2), SCHEDULE, MONDAY, days=7, resolution=resolution)
+    # Monday to Thursday nights (14 h each) plus Friday 18:00 to the end of Sunday (54 h)
+    assert result['running'].sum() * resolution / 60 == pytest.approx(2 * (4 * 14 + 54), abs=0.5)
+    assert int(result['running'].max()) == 2
+    assert int(result['starts'].sum()) == 2 * 5
+    assert int(result['stops'].sum()) == 2 * 4
+
+
+def test_state_carries_forward_until_the_first_transition():
+    result = simulate(inventory('daytime', 'running'), SCHEDULE, MONDAY, days=7)
+    # Running from Monday 00:00 until the 18:00 stop, then 10 h on each of Tuesday to Friday
+    assert result['running'].sum() / 60 == 18 + 4 * 10
+    assert int(result['starts'].sum()) == 4
+    assert int(result['stops'].sum()) == 5
+
+
+def test_ec2_calls_are_batched_per_region_and_action():
+    result = simulate(inventory('overnight', 'stopped', 3), SCHEDULE, MONDAY, days=1, ec2_batch_size=2)
+    # One start at 18:00 for three instances needs two calls
+    assert int(result['api_calls'].sum()) == 2
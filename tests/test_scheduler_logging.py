@@ -0,0 +1,30 @@
+import logging
+from scheduler_logging import log_resources, summarize_resources
+
+
+class Collect(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_sample_is_rendered_before_details_change():
+    logger = logging.getLogger('test_scheduler_logging')
+    logger.setLevel(logging.INFO)
+    handler = Collect()
+    logger.addHandler(handler)
+    details = {'type': 't3.micro'}
+    log_resources(logger, 'EC2 instances', [('i-1', 'us-east-1', 'p', 'running', details)], mode='summary')
+    log_resources(logger, 'EC2 instances', [('i-1', 'us-east-1', 'p', 'running', details)], mode='full')
+    details['hibernate'] = True
+    assert all('hibernate' not in record.getMessage() for record in handler.records)
+    logger.removeHandler(handler)
+
+
+def test_summary_counts_add_up_without_plans():
+    by_region, by_plan = summarize_resources([('i-1', 'us-east-1', 'p'), ('i-2', 'us-west-2')])
+    assert by_region == {'us-east-1': 1, 'us-west-2': 1}
+    assert by_plan == {'p': 1, None: 1}
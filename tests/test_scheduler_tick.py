@@ -0,0 +1,15 @@
+import json
+import scheduler_tick
+from boot_latency import save_store
+
+
+def test_pending_starts_are_polled_with_prestart_off(tmp_path, monkeypatch):
+    monkeypatch.setattr(scheduler_tick, 'PRESTART_ENABLED', False)
+    schedule_file = tmp_path / 'schedule.json'
+    schedule_file.write_text(json.dumps({}))
+    store_file = tmp_path / 'boot_latency.json'
+    monkeypatch.setattr(scheduler_tick, 'load_store', lambda: json.loads(store_file.read_text()))
+    save_store({'resources': {}, 'types': {}, 'pending': {}}, str(store_file))
+    assert not scheduler_tick.boot_work_now(str(schedule_file))
+    save_store({'resources': {}, 'types': {}, 'pending': {'ec2:i-1': {'region': 'us-east-1', 'started': 0}}}, str(store_file))
+    assert scheduler_tick.boot_work_now(str(schedule_file))
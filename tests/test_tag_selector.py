@@ -0,0 +1,47 @@
+import pytest
+from tag_selector import parse_selector, compile_selector, tagging_filters
+from tagging_discovery import restrict_to_plans
+
+
+def test_parse_default_selector():
+    assert parse_selector('Schedule=On AND Plan EXISTS') == [('Schedule', 'eq', ('On',)), ('Plan', 'exists', ())]
+
+
+def test_parse_every_operator():
+    terms = parse_selector('Env != prod AND Team IN (a, b) AND Tier NOT IN (x) AND Owner NOT EXISTS')
+    assert terms == [('Env', 'ne', ('prod',)), ('Team', 'in', ('a', 'b')), ('Tier', 'not_in', ('x',)), ('Owner', 'not_exists', ())]
+
+
+def test_and_inside_quotes_is_part_of_the_value():
+    assert parse_selector('Team="R AND D" AND Plan EXISTS') == [('Team', 'eq', ('R AND D',)), ('Plan', 'exists', ())]
+
+
+def test_comma_inside_quotes_is_part_of_an_in_value():
+    assert parse_selector("Team IN ('a,b', c)") == [('Team', 'in', ('a,b', 'c'))]
+
+
+@pytest.mark.parametrize('expression', ['Team IN ()', 'Team NOT IN ( , )'])
+def test_empty_value_list_is_rejected(expression):
+    with pytest.raises(ValueError, match='Empty value list'):
+        parse_selector(expression)
+
+
+def test_unparseable_term_is_rejected():
+    with pytest.raises(ValueError, match='Cannot parse'):
+        parse_selector('Schedule On')
+
+
+def test_compile_selector_filters_and_predicate():
+    filters, matches = compile_selector('Schedule=On AND Plan EXISTS AND Env != prod AND Team NOT IN (ops)')
+    assert filters == [{'Name': 'tag:Schedule', 'Values': ['On']}, {'Name': 'tag-key', 'Values': ['Plan']}]
+    assert matches({'Schedule': 'On', 'Plan': 'p1', 'Team': 'dev'})
+    assert not matches({'Schedule': 'On', 'Plan': 'p1', 'Env': 'prod'})
+    assert not matches({'Schedule': 'On', 'Plan': 'p1', 'Team': 'ops'})
+    assert not matches({'Schedule': 'On'})
+
+
+def test_tagging_discovery_merges_the_plan_filters():
+    filters = restrict_to_plans(tagging_filters(parse_selector('Schedule=On AND Plan EXISTS')), {'b', 'a'})
+    assert filters == [{'Key': 'Schedule', 'Values': ['On']}, {'Key': 'Plan', 'Values': ['a', 'b']}]
+    filters = restrict_to_plans(tagging_filters(parse_selector('Plan IN (a, c)')), {'a', 'b'})
+    assert filters == [{'Key': 'Plan', 'Values': ['a']}]
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+from pytz import timezone, utc
+from transition_index import build_transition_index, transitions_since, minute_of_week
+
+SCHEDULE = {
+    'office': {'start_time': '08:00', 'stop_time': '18:00', 'start_days': [1, 2, 3, 4, 5], 'stop_days': [1, 2, 3, 4, 5],
+               'timezone': 'US/Eastern'},
+    'night': {'start_time': '01:30', 'stop_time': '05:00', 'start_days': [7], 'stop_days': [7], 'timezone': 'US/Eastern'},
+}
+INDEX = build_transition_index(SCHEDULE)
+EASTERN = timezone('US/Eastern')
+
+
+def eastern(*args):
+    return EASTERN.localize(datetime(*args))
+
+
+def brute_force(index, since, now):
+    latest = {}
+    minute = since.astimezone(utc).replace(second=0, microsecond=0) + timedelta(minutes=1)
+    while minute <= now:
+        for tz_name, table in index.items():
+            local = minute.astimezone(timezone(tz_name))
+            for plan_name, action in table.get(minute_of_week(local.isoweekday(), local.time()), {}).items():
+                latest[plan_name] = (action, minute)
+        minute += timedelta(minutes=1)
+    return latest
+
+
+def test_window_excludes_since_and_includes_now():
+    start = eastern(2026, 10, 19, 8, 0)
+    assert transitions_since(INDEX, start, start + timedelta(minutes=5)) == {}
+    assert transitions_since(INDEX, start - timedelta(minutes=1), start) == {'office': ('start', start.astimezone(utc))}
+
+
+def test_latest_transition_of_each_plan_wins():
+    since = eastern(2026, 10, 19, 7, 0)
+    assert transitions_since(INDEX, since, eastern(2026, 10, 20, 9, 0)) == {'office': ('start', eastern(2026, 10, 20, 8, 0).astimezone(utc))}
+
+
+def test_without_since_only_the_current_minute_counts():
+    now = eastern(2026, 10, 19, 18, 0, 30)
+    assert transitions_since(INDEX, None, now) == {'office': ('stop', eastern(2026, 10, 19, 18, 0).astimezone(utc))}
+    assert transitions_since(INDEX, None, now + timedelta(minutes=1)) == {}
+
+
+def test_window_is_capped_at_max_minutes():
+    now = eastern(2026, 10, 19, 9, 0)
+    assert transitions_since(INDEX, now - timedelta(days=3), now, max_minutes=30) == {}
+    assert transitions_since(INDEX, now - timedelta(days=3), now, max_minutes=61) == {'office': ('start', eastern(2026, 10, 19, 8, 0).astimezone(utc))}
+
+
+def test_since_after_now_is_an_empty_window():
+    now = eastern(2026, 10, 19, 8, 0)
+    assert transitions_since(INDEX, now + timedelta(hours=1), now) == {}
+
+
+def test_matches_minute_by_minute_conversion_across_dst_changes():
+    for since in (eastern(2026, 3, 6, 12, 0), eastern(2026, 10, 30, 12, 0)):
+        now = since + timedelta(days=3)
+        assert transitions_since(INDEX, since, now) == brute_force(INDEX, since, now)
+
+
+def test_time_repeated_at_fall_back_reports_the_later_occurrence():
+    since = eastern(2026, 11, 1, 0, 0)
+    assert transitions_since(INDEX, since, since + timedelta(hours=4)) == {'night': ('start', datetime(2026, 11, 1, 6, 30, tzinfo=utc))}
+
@@ -0,0 +1,66 @@
+import pytest
+from wave_scheduler import assign_waves, group_waves, run_waves
+
+
+def entry(resource_id, kind='ec2', action='start'):
+    return ('window', kind, resource_id, 'us-east-1', action)
+
+
+def test_entries_without_tags_share_wave_zero():
+    entries = [entry('i-1'), entry('i-2')]
+    assert assign_waves(entries, {}) == [0, 0]
+
+
+def test_depends_on_places_entry_after_dependency():
+    entries = [entry('app'), entry('db', kind='rds_instance')]
+    tags = {('ec2', 'app'): {'DependsOn': 'db'}}
+    assert assign_waves(entries, tags) == [1, 0]
+
+
+def test_depends_on_resolves_name_tag():
+    entries = [entry('i-app'), entry('i-db')]
+    tags = {('ec2', 'i-app'): {'DependsOn': 'database'}, ('ec2', 'i-db'): {'Name': 'database'}}
+    assert assign_waves(entries, tags) == [1, 0]
+
+
+def test_explicit_wave_is_a_lower_bound():
+    entries = [entry('i-1'), entry('i-2')]
+    tags = {('ec2', 'i-1'): {'Wave': '3'}, ('ec2', 'i-2'): {'DependsOn': 'i-1', 'Wave': '1'}}
+    assert assign_waves(entries, tags) == [3, 4]
+
+
+def test_dependency_outside_the_entries_is_satisfied():
+    entries = [entry('i-1')]
+    assert assign_waves(entries, {('ec2', 'i-1'): {'DependsOn': 'i-missing'}}) == [0]
+
+
+def test_non_numeric_wave_is_ignored():
+    assert assign_waves([entry('i-1')], {('ec2', 'i-1'): {'Wave': 'first'}}) == [0]
+
+
+def test_cycle_raises():
+    entries = [entry('i-1'), entry('i-2')]
+    tags = {('ec2', 'i-1'): {'DependsOn': 'i-2'}, ('ec2', 'i-2'): {'DependsOn': 'i-1'}}
+    with pytest.raises(ValueError, match='cycle'):
+        assign_waves(entries, tags)
+
+
+def test_stops_run_in_reverse_wave_order():
+    entries = [entry('app', action='stop'), entry('db', action='stop')]
+    starts = group_waves(entries, [1, 0], 'start')
+    stops = group_waves(entries, [1, 0], 'stop')
+    assert [[e[2] for e in wave] for wave in starts] == [['db'], ['app']]
+    assert [[e[2] for e in wave] for wave in stops] == [['app'], ['db']]
+
+
+def test_run_waves_stops_dispatching_when_asked():
+    dispatched = []
+
+    def dispatch(batch):
+        dispatched.extend(batch)
+        return batch
+
+    waves = [[entry('i-1')], [entry('i-2')]]
+    confirmed = run_waves(waves, dispatch, lambda wave: None, should_stop=lambda: 'deadline' if dispatched else None)
+    assert [e[2] for e in dispatched] == ['i-1']
+    assert [e[2] for e in confirmed] == ['i-1']
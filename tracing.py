@@ -0,0 +1,134 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger()
+
+# SCHEDULER_TRACE=1 writes a Chrome trace-event file per run (open in chrome://tracing or Perfetto)
+SCHEDULER_TRACE = os.getenv('SCHEDULER_TRACE') == '1'
+TRACE_DIR = os.getenv('TRACE_DIR', 'traces')
+
+_events = []
+_thread_names = {}
+_lock = threading.Lock()
+_active = False
+_origin = 0.0
+
+def _now_us():
+    return (time.perf_counter() - _origin) * 1e6
+
+def add_span(name, category, start_us, end_us, args=None):
+    """
+    Record a complete ('X') event on the calling thread.
+    """
+    thread = threading.current_thread()
+    with _lock:
+        _thread_names[thread.ident] = thread.name
+        _events.append({'name': name, 'cat': category, 'ph': 'X', 'ts': start_us, 'dur': max(end_us - start_us, 0),
+                        'pid': os.getpid(), 'tid': thread.ident, 'args': args or {}})
+
+@contextmanager
+def span(name, category='stage', **args):
+    """
+    Trace the enclosed block as one span. A no-op unless a trace is running.
+    """
+    if not _active:
+        yield
+        return
+    start = _now_us()
+    try:
+        yield
+    finally:
+        add_span(name, category, start, _now_us(), args)
+
+def attach_tracing(client):
+    """
+    Register hooks that record every API call made by the client as an 'api' span.
+    Pages of a paginated call and per-resource tag lookups each show up as their own span.
+    """
+    service = client.meta.service_model.service_name
+    region = client.meta.region_name
+
+    def before_call(context, **kwargs):
+        if _active:
+            context['trace_start'] = _now_us()
+
+    def after_call(http_response, model, context, **kwargs):
+        if 'trace_start' in context:
+            add_span(f'{service}.{model.name}', 'api', context.pop('trace_start'), _now_us(),
+                     {'region': region, 'status': http_response.status_code})
+
+    def after_call_error(exception, context, event_name, **kwargs):
+        if 'trace_start' in context:
+            add_span(f"{service}.{event_name.rsplit('.', 1)[-1]}", 'api', context.pop('trace_start'), _now_us(),
+                     {'region': region, 'error': str(exception)})
+
+    client.meta.events.register('before-call', before_call)
+    client.meta.events.register('after-call', after_call)
+    client.meta.events.register('after-call-error', after_call_error)
+    return client
+
+def critical_path(events, root_tid):
+    """
+    Walk back from the end of the run through the root thread's top-level spans: each step is the
+    span that finished last before the previous one started. For each step, also name the span on
+    any thread that finished last inside it, which is what the step was waiting on.
+    """
+    top_level = []
+    covered_until = -1
+    for event in sorted((event for event in events if event['tid'] == root_tid), key=lambda event: (event['ts'], -event['dur'])):
+        if event['ts'] >= covered_until:
+            top_level.append(event)
+            covered_until = event['ts'] + event['dur']
+
+    steps = []
+    cursor = float('inf')
+    for step in sorted(top_level, key=lambda event: event['ts'] + event['dur'], reverse=True):
+        end = step['ts'] + step['dur']
+        if end > cursor:
+            continue
+        inner = [event for event in events if event is not step and step['ts'] <= event['ts'] and event['ts'] + event['dur'] <= end]
+        last = max(inner, key=lambda event: event['ts'] + event['dur'], default=None)
+        entry = {'name': step['name'], 'ms': round(step['dur'] / 1000, 3)}
+        if last:
+            entry['waiting_on'] = last['name']
+            entry['waiting_on_thread'] = _thread_names.get(last['tid'], str(last['tid']))
+        steps.append(entry)
+        cursor = step['ts']
+    return list(reversed(steps))
+
+def write_trace(path, summary):
+    with _lock:
+        events = list(_events)
+        names = dict(_thread_names)
+    metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': name}} for tid, name in names.items()]
+    with open(path, 'w') as file:
+        json.dump({'traceEvents': metadata + events, 'displayTimeUnit': 'ms', 'otherData': {'critical_path': summary}}, file)
+
+def trace_run(func, *args, label='run', directory=TRACE_DIR, **kwargs):
+    """
+    Run func with tracing on and write <label>-<timestamp>.json with a critical-path summary.
+    """
+    global _active, _origin
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{label}-{datetime.now().strftime('%Y%m%dT%H%M%S')}.json")
+    with _lock:
+        _events.clear()
+        _thread_names.clear()
+    _origin = time.perf_counter()
+    _active = True
+    try:
+        with span(label, 'run'):
+            return func(*args, **kwargs)
+    finally:
+        _active = False
+        with _lock:
+            events = [event for event in _events if event['cat'] != 'run']
+        summary = critical_path(events, threading.get_ident())
+        write_trace(path, summary)
+        logger.info('Trace written to %s; critical path: %s', path,
+                    ' -> '.join(f"{step['name']} ({step['ms']:.0f} ms)" for step in summary))
@@ -0,0 +1,85 @@
+import os
+from datetime import datetime, time, timedelta
+from pytz import timezone, utc
+
+DEFAULT_TIMEZONE = 'US/Eastern'
+# A week back covers the latest transition of every plan, however long the scheduler was down
+CATCHUP_MAX_MINUTES = int(os.getenv('CATCHUP_MAX_MINUTES', '10080'))
+
+def minute_of_week(day, clock):
+    """
+    Convert an ISO weekday (1-7) and a time of day to a minute offset within the week.
+    """
+    return (day - 1) * 1440 + clock.hour * 60 + clock.minute
+
+def build_transition_index(schedule):
+    """
+    Map each plan timezone to {minute_of_week: {plan_name: action}} for every start and stop transition.
+    """
+    index = {}
+    for plan_name, plan_schedule in schedule.items():
+        table = index.setdefault(plan_schedule.get('timezone', DEFAULT_TIMEZONE), {})
+        start_time = time.fromisoformat(plan_schedule['start_time'])
+        stop_time = time.fromisoformat(plan_schedule['stop_time'])
+        for day in plan_schedule['stop_days']:
+            table.setdefault(minute_of_week(day, stop_time), {})[plan_name] = 'stop'
+        # A start and stop on the same minute resolves to start
+        for day in plan_schedule['start_days']:
+            table.setdefault(minute_of_week(day, start_time), {})[plan_name] = 'start'
+    return index
+
+def utc_offset_minutes(tz, epoch_minute):
+    return int(datetime.fromtimestamp(epoch_minute * 60, utc).astimezone(tz).utcoffset().total_seconds()) // 60
+
+def transitions_since(index, since, now, max_minutes=CATCHUP_MAX_MINUTES):
+    """
+    Return {plan_name: (action, when)} with the latest transition of each plan in the window
+    (since, now], at most max_minutes long, when in UTC. Without a since, only the current minute is checked.
+    """
+    end = int(now.timestamp()) // 60
+    minutes = 1
+    if since is not None:
+        minutes = min(max(end - int(since.timestamp()) // 60, 0), max_minutes)
+    latest = {}
+    for tz_name, table in index.items():
+        tz = timezone(tz_name)
+        # UTC offsets are looked up once per hour; only an hour with a DST change converts every minute
+        offsets = {}
+        # Walk forward in epoch minutes so later transitions overwrite earlier ones
+        for minute in range(end - minutes + 1, end + 1):
+            hour = minute // 60
+            if hour not in offsets:
+                first = utc_offset_minutes(tz, hour * 60)
+                offsets[hour] = first if first == utc_offset_minutes(tz, hour * 60 + 59) else None
+            offset = offsets[hour]
+            local = minute + (utc_offset_minutes(tz, minute) if offset is None else offset)
+            # Epoch day 0 was a Thursday, ISO weekday 4
+            actions = table.get((local // 1440 + 3) % 7 * 1440 + local % 1440)
+            if actions:
+                when = datetime.fromtimestamp(minute * 60, utc)
+                for plan_name, action in actions.items():
+                    latest[plan_name] = (action, when)
+    return latest
+
+def upcoming_starts(index, now, horizon_minutes):
+    """
+    Return {plan_name: minutes_until_start} for plans whose next start falls within the horizon.
+    """
+    upcoming = {}
+    for tz_name, table in index.items():
+        local = now.astimezone(timezone(tz_name))
+        current = minute_of_week(local.isoweekday(), local.time())
+        for minutes in range(1, horizon_minutes + 1):
+            for plan_name, action in table.get((current + minutes) % 10080, {}).items():
+                if action == 'start':
+                    upcoming.setdefault(plan_name, minutes)
+    return upcoming
+
+def group_by_plan(resources):
+    """
+    Index resource tuples by their plan name.
+    """
+    by_plan = {}
+    for resource in resources:
+        by_plan.setdefault(resource[2], []).append(resource)
+    return by_plan
@@ -0,0 +1,87 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger()
+
+WAVE_TAG = 'Wave'
+DEPENDS_ON_TAG = 'DependsOn'
+WAVE_WORKERS = int(os.getenv('WAVE_WORKERS', '16'))
+
+def resource_dependencies(tags):
+    """
+    Parse the comma-separated DependsOn tag into a list of resource identifiers or Name tags.
+    """
+    return [name.strip() for name in tags.get(DEPENDS_ON_TAG, '').split(',') if name.strip()]
+
+def assign_waves(entries, tags_by_key):
+    """
+    Turn Wave and DependsOn tags into a wave number per entry.
+    An entry runs after every entry it depends on and never earlier than its explicit Wave.
+    Dependencies on resources outside this set of entries are treated as already satisfied.
+    Raises ValueError on a dependency cycle.
+    """
+    keys = [(entry[1], entry[2]) for entry in entries]
+    by_name = {}
+    for key in keys:
+        tags = tags_by_key.get(key, {})
+        by_name[key[1]] = key
+        if 'Name' in tags:
+            by_name[tags['Name']] = key
+
+    waves = {}
+    visiting = set()
+
+    def wave_of(key):
+        if key in waves:
+            return waves[key]
+        if key in visiting:
+            raise ValueError(f'Dependency cycle through {key[0]} {key[1]}')
+        visiting.add(key)
+        tags = tags_by_key.get(key, {})
+        try:
+            wave = int(tags.get(WAVE_TAG, 0))
+        except ValueError:
+            logger.warning('Ignoring non-numeric %s tag on %s %s', WAVE_TAG, key[0], key[1])
+            wave = 0
+        for name in resource_dependencies(tags):
+            if name in by_name and by_name[name] != key:
+                wave = max(wave, wave_of(by_name[name]) + 1)
+        visiting.discard(key)
+        waves[key] = wave
+        return wave
+
+    return [wave_of(key) for key in keys]
+
+def group_waves(entries, wave_numbers, action):
+    """
+    Group entries into ordered waves: ascending for starts, descending (reverse dependency order) for stops.
+    """
+    grouped = {}
+    for entry, wave in zip(entries, wave_numbers):
+        grouped.setdefault(wave, []).append(entry)
+    return [grouped[wave] for wave in sorted(grouped, reverse=(action == 'stop'))]
+
+def run_waves(waves, dispatch, wait_ready, make_batches=None, workers=WAVE_WORKERS, should_stop=None):
+    """
+    Dispatch each wave with full parallelism, then wait for it to report ready before starting the next.
+    make_batches splits a wave into lists of entries that share one dispatch (one entry each by default);
+    dispatch takes such a list and returns the entries that succeeded; wait_ready takes the successful
+    entries of a wave. should_stop, checked before every wave, returns a reason to dispatch nothing more
+    (or None to go on). Returns the entries that were dispatched successfully.
+    """
+    make_batches = make_batches or (lambda wave: [[entry] for entry in wave])
+    succeeded = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for number, wave in enumerate(waves):
+            reason = should_stop() if should_stop else None
+            if reason:
+                logger.error('Not dispatching waves %d-%d (%d actions): %s', number, len(waves) - 1,
+                             sum(len(remaining) for remaining in waves[number:]), reason)
+                break
+            done = [entry for result in executor.map(dispatch, make_batches(wave)) for entry in result]
+            succeeded.extend(done)
+            if done and number < len(waves) - 1:
+                logger.info('Waiting for wave %d (%d resources) to become ready', number, len(done))
+                wait_ready(done)
+    return succeeded